@@ -0,0 +1,140 @@
+from benchmarks.schemas import SCHEMA_BUILDERS
+from src.instantiation.dbinstance import DBInstance
+from src.utils.utilfunctions import write_db_inst
+from contextlib import contextmanager
+import subprocess
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import shutil
+import time
+import json
+import sys
+
+# Benchmark of the phases of a database generation (regular tuples, FK closure, degeneration, ASP outputs)
+# on synthetic schemas of increasing sizes. Results are written as JSON, and can be compared to a previous run :
+#   python -m benchmarks.run --sizes 1000 100000 --output after.json --compare before.json
+
+
+class PhaseRecorder:
+    # times phases of one benchmark case, with their peak of traced memory if trace_memory
+
+    def __init__(self, schema_name, size, trace_memory=False):
+        self.schema_name = schema_name
+        self.size = size
+        self.trace_memory = trace_memory
+        self.results = []
+
+    @contextmanager
+    def phase(self, name, get_nbr_tuples):
+        # get_nbr_tuples() called after the phase gives the nbr of tuples it processed
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            nbr_tuples = get_nbr_tuples()
+            self.results.append({"schema": self.schema_name, "size": self.size, "phase": name,
+                                 "seconds": round(seconds, 6), "tuples": nbr_tuples,
+                                 "tuples_per_sec": round(nbr_tuples / seconds, 1) if seconds > 0 else None,
+                                 "peak_memory_bytes": peak})
+
+
+def db_size(db):
+    return sum(rel_inst.get_size() for rel_inst in db.rel_insts.values())
+
+
+def run_case(schema_name, size, part_deg=10, seed=0, trace_memory=False, sqlite=False):
+    recorder = PhaseRecorder(schema_name, size, trace_memory)
+    db = DBInstance(SCHEMA_BUILDERS[schema_name](size), generate=False, seed=seed)
+    fk_tuples = {}
+    with recorder.phase("generate_instance", lambda: db_size(db)):
+        for rel_inst, gen_fk_tuples in db.generate_regular_instances():
+            db.rel_insts[rel_inst.name] = rel_inst
+            db.fill_fk_tuples_per_rel(fk_tuples, gen_fk_tuples)
+    nbr_regular = db_size(db)
+    with recorder.phase("generate_tuples_from_fks", lambda: db_size(db) - nbr_regular):
+        db.generate_tuples_from_fks(fk_tuples)
+    nbr_consistent = db_size(db)
+    deg_params = {name: ((rel_inst.get_size() * part_deg) // 100, True)
+                  for name, rel_inst in db.rel_insts.items()}
+    with recorder.phase("degenerate_insts", lambda: db_size(db) - nbr_consistent):
+        db.degenerate_insts(deg_params)
+    with recorder.phase("repr_ASP", lambda: db_size(db)):
+        db.repr_ASP()
+    target_dir = tempfile.mkdtemp()
+    try:
+        with recorder.phase("write_db_inst", lambda: db_size(db)):
+            write_db_inst(db, target_dir=target_dir)
+        if sqlite:
+            with recorder.phase("write_db_inst_sqlite", lambda: db_size(db)):
+                write_db_inst(db, asp=False, sqlite=True, target_dir=target_dir)
+    finally:
+        shutil.rmtree(target_dir)
+    return recorder.results
+
+
+def get_run_info(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit or None, "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+            "platform": platform.platform(), "seed": args.seed, "part_deg": args.part_deg,
+            "trace_memory": args.trace_memory}
+
+
+def compare(results, previous_results):
+    # ratio of throughputs (> 1 is faster than previous) for cases present in both runs
+    previous = {(res["schema"], res["size"], res["phase"]): res for res in previous_results}
+    lines = []
+    for res in results:
+        prev = previous.get((res["schema"], res["size"], res["phase"]))
+        if prev and prev["tuples_per_sec"] and res["tuples_per_sec"]:
+            ratio = res["tuples_per_sec"] / prev["tuples_per_sec"]
+            lines.append(f"{res['schema']:>15} {res['size']:>10} {res['phase']:>25} x{ratio:.2f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark generation phases on synthetic schemas")
+    parser.add_argument("--schemas", nargs='+', choices=sorted(SCHEMA_BUILDERS), default=sorted(SCHEMA_BUILDERS))
+    parser.add_argument("--sizes", nargs='+', type=int, default=[1000, 10000, 100000],
+                        help="nbr of regular tuples to generate per schema (up to 10M)")
+    parser.add_argument("--part-deg", type=int, default=10, help="percentage of tuples to degenerate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="trace peak memory of each phase (tracemalloc slows down the measured phases)")
+    parser.add_argument("--sqlite", action="store_true", help="also benchmark export to SQLite")
+    parser.add_argument("--output", help="JSON file to write results in (stdout if not given)")
+    parser.add_argument("--compare", help="JSON results of a previous run to compare throughputs with")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        for schema_name in args.schemas:
+            case_results = run_case(schema_name, size, args.part_deg, args.seed, args.trace_memory, args.sqlite)
+            for res in case_results:
+                print(f"{res['schema']:>15} {res['size']:>10} {res['phase']:>25} {res['seconds']:>10.3f}s "
+                      f"{res['tuples_per_sec'] or 0:>12.0f} tuples/s", file=sys.stderr)
+            results.extend(case_results)
+    report = {"run": get_run_info(args), "results": results}
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(report, fp, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+    if args.compare:
+        with open(args.compare) as fp:
+            print(compare(results, json.load(fp)["results"]), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
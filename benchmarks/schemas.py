@@ -0,0 +1,78 @@
+from src.model.relation import Relation
+from src.model.attribute import AttributeInfo, AttributeTypes
+from src.model.generators import get_generator_rdm_int, get_generator_concat
+
+# Synthetic schemas to benchmark generation at any size. Each builder takes the total nbr of regular tuples to
+# generate and returns instantiation parameters as given to DBInstance, {Relation: nbr_tuples}.
+
+
+def id_attr(name="id"):
+    return AttributeInfo(name, attr_type=AttributeTypes.incr_int)
+
+
+def ref_attr(name, nbr_referenced):
+    # random reference among the nbr_referenced first ids of a referenced relation
+    return AttributeInfo(name, get_generator_fun=get_generator_rdm_int(1, max(nbr_referenced, 1)))
+
+
+def build_wide(nbr_tuples, nbr_attrs=30):
+    # one relation with many attributes of all types
+    types = [AttributeTypes.int, AttributeTypes.str, AttributeTypes.boolean, AttributeTypes.incr_str]
+    attributes = [id_attr()] + [AttributeInfo(f"attr{ind}", attr_type=types[ind % len(types)])
+                                for ind in range(nbr_attrs)]
+    return {Relation("Wide", attributes=attributes, pk="id"): nbr_tuples}
+
+
+def build_chain(nbr_tuples, length=8):
+    # Rel0 <- Rel1 <- ... <- Rel(length-1), only the last one gets tuples, others are filled by FK closure
+    rels = [Relation("Chain0", attributes=[id_attr(), AttributeInfo("val", attr_type=AttributeTypes.str)], pk="id")]
+    for ind in range(1, length):
+        rel = Relation(f"Chain{ind}", attributes=[id_attr(), ref_attr("ref", nbr_tuples // 2)], pk="id")
+        rel.add_fk_constraint({"ref": (rels[-1], {"ref": "id"})})
+        rels.append(rel)
+    return {rel: (nbr_tuples if rel is rels[-1] else 0) for rel in rels}
+
+
+def build_star(nbr_tuples, nbr_dims=6):
+    # a fact relation referencing dimension relations, dimensions are filled by FK closure
+    dims = [Relation(f"Dim{ind}", attributes=[id_attr(), AttributeInfo("label", attr_type=AttributeTypes.str)],
+                     pk="id") for ind in range(nbr_dims)]
+    fact = Relation("Fact", attributes=[id_attr(), AttributeInfo("measure")] +
+                    [ref_attr(f"dim{ind}", nbr_tuples // 100) for ind in range(nbr_dims)], pk="id")
+    for ind, dim in enumerate(dims):
+        fact.add_fk_constraint({f"dim{ind}": (dim, {f"dim{ind}": "id"})})
+    params = {dim: 0 for dim in dims}
+    params[fact] = nbr_tuples
+    return params
+
+
+def build_composite(nbr_tuples):
+    # composite PK referenced by a composite FK
+    parent = Relation("Parent", attributes=[id_attr("a"), AttributeInfo("b", attr_type=AttributeTypes.str),
+                                            AttributeInfo("val")], pk=["a", "b"])
+    child = Relation("Child", attributes=[id_attr(), ref_attr("pa", nbr_tuples),
+                                          AttributeInfo("pb", attr_type=AttributeTypes.str)], pk="id")
+    child.add_fk_constraint({("pa", "pb"): (parent, {"pa": "a", "pb": "b"})})
+    return {parent: nbr_tuples // 2, child: nbr_tuples - nbr_tuples // 2}
+
+
+def build_self_reference(nbr_tuples):
+    # relation referencing itself, as employees and their manager
+    employee = Relation("Employee", attributes=[id_attr(), ref_attr("manager", nbr_tuples),
+                                                AttributeInfo("name", attr_type=AttributeTypes.str)], pk="id")
+    employee.add_fk_constraint({"manager": (employee, {"manager": "id"})})
+    return {employee: nbr_tuples}
+
+
+def build_derived(nbr_tuples):
+    # concatenated key derived column-wise from others attributes, as for composite keys
+    code = AttributeInfo("code", gen_order=2, attr_type=AttributeTypes.str,
+                         get_generator_fun=get_generator_concat(["kind", "num", "label"]))
+    item = Relation("Item", attributes=[id_attr(), AttributeInfo("kind", attr_type=AttributeTypes.boolean),
+                                        AttributeInfo("num"), AttributeInfo("label", attr_type=AttributeTypes.str),
+                                        code], pk="id")
+    return {item: nbr_tuples}
+
+
+SCHEMA_BUILDERS = {"wide": build_wide, "chain": build_chain, "star": build_star, "composite": build_composite,
+                   "self_reference": build_self_reference, "derived": build_derived}
@@ -1,12 +1,57 @@
-from src.utils.utilfunctions import fill_tuple_dflt_vals
+from src.utils.utilfunctions import fill_tuple_dflt_vals, run_in_processes, strongly_connected_components
 from src.model.relation import Relation
+from src.model.randomness import GenerationContext
+from src.instantiation.instcache import InstanceCache
+from src.instantiation.genstats import GenerationStats
+from src.instantiation.relinstance import SchemaError
+from contextlib import nullcontext
+from functools import partial
+from itertools import groupby
+from operator import itemgetter
+import warnings
+
+
+def generate_regular_state(rel, param, context):
+    # regular tuples of rel generated in a worker process, only picklable content goes back (no Relation instance)
+    rel_inst, gen_fk_tuples = rel.generate_instance(param[0], param[1], param[2], context=context)
+    return rel_inst.get_generated_state(), {o_rel.name: tuples for o_rel, tuples in gen_fk_tuples.items()}
+
+
+class FKClosureError(ValueError):
+
+    def __init__(self, msg, unresolved_fk_tuples):
+        super().__init__(msg)
+        self.unresolved_fk_tuples = unresolved_fk_tuples
 
 
 class DBInstance:
+    STREAM_CHUNK_SIZE = 100000  # default nbr of tuples generated at once when streaming to a sink
 
-    def __init__(self, rels_inst_params, respect_fk=True, generate=True):
+    def __init__(self, rels_inst_params, respect_fk=True, generate=True, columnar=False, workers=1, shards=1,
+                 max_fk_cycle_rounds=100, seed=None, cache_dir=None, stats=False, progress=None, sink=None,
+                 chunk_size=None, strict_fk=False):
         self.rels_inst_params = []
         self.respect_fk = respect_fk
+        self.columnar = columnar  # store tuples of relation instances column by column (compact in memory)
+        self.workers = workers  # nbr of processes generating regular tuples of relations in parallel
+        self.shards = shards  # nbr of processes generating regular tuples of a single relation (if not in workers)
+        # FK closure in relations referencing each other in cycle stops after this nbr of rounds, remaining partial
+        # FK tuples are then kept in unresolved_fk_tuples, with a warning (or a FKClosureError raised if strict_fk)
+        self.max_fk_cycle_rounds = max_fk_cycle_rounds
+        self.strict_fk = strict_fk
+        self.unresolved_fk_tuples = {}
+        # with a seed, every generator draws from its own stream derived from it : same seed, same instance
+        # whatever the nbr of workers or shards
+        self.context = GenerationContext(seed) if seed is not None else None
+        # with a sink (as dbexport.ASPSink), tuples are written to it as generated instead of being kept in relation
+        # instances (only their PK values are), chunk_size tuples at most being generated at once
+        self.sink = sink
+        self.chunk_size = chunk_size if chunk_size or sink is None else self.STREAM_CHUNK_SIZE
+        # regular tuples of relations whose schema and params didn't change are loaded from cache (seeded only)
+        use_cache = cache_dir is not None and seed is not None and sink is None
+        self.cache = InstanceCache(cache_dir, seed) if use_cache else None
+        # timings and counters of the generation, collected only if asked (or to call progress(phase, relname, nbr))
+        self.stats = GenerationStats(progress) if stats or progress is not None else None
         self.rel_insts = {}  # to fill as {relname: RelInstance} where RelInstance will be the one generated from params
         self.treat_instantiation_params(rels_inst_params)
         if generate:
@@ -16,40 +61,129 @@ class DBInstance:
 
     def generate_tuples_from_fks(self, curr_fk_tuples):
         # curr_fk_tuple as {relname : [{attr1: val1,..}, {attr1: val1,..}], relname2: [...]}
-        # where each {attr: val, attr2: val2} are partially valued attribute of a FK tuple referencing relname
-        while curr_fk_tuples:
-            rel_name, tuples = curr_fk_tuples.popitem()
-            rel_inst = self.rel_insts.get(rel_name, None)
-            if rel_inst:
+        # where each {attr: val, attr2: val2} are partially valued attribute of a FK tuple referencing relname.
+        # Relations are completed following FK graph order, so that all partial tuples for a relation are known
+        # before generating them in one batch. Relations referencing each other in cycle are completed together,
+        # round after round until no partial tuple remains (or max_fk_cycle_rounds is reached).
+        for component in self.get_fk_closure_schedule():
+            rounds = 0
+            while any(curr_fk_tuples.get(rel_name) for rel_name in component):
+                if rounds >= self.max_fk_cycle_rounds:
+                    break
+                for rel_name in component:
+                    tuples = curr_fk_tuples.pop(rel_name, None)
+                    if tuples:
+                        self.generate_tuples_from_fk(self.rel_insts[rel_name], tuples, curr_fk_tuples)
+                rounds += 1
+            if self.stats is not None:
+                self.stats.closure_rounds += rounds
+        # remaining are for relations without instance or unresolved in FK cycles
+        unresolved = {rel_name: tuples for rel_name, tuples in curr_fk_tuples.items()
+                      if tuples and rel_name in self.rel_insts}
+        self.fill_fk_tuples_per_rel(self.unresolved_fk_tuples, unresolved)
+        curr_fk_tuples.clear()
+        if unresolved:
+            self.signal_unresolved_fk_tuples(unresolved)
+
+    def signal_unresolved_fk_tuples(self, unresolved):
+        # FK cycles not closed in max_fk_cycle_rounds : generated tuples reference values missing in unresolved
+        nbr_unresolved = sum(map(len, unresolved.values()))
+        if self.stats is not None:
+            self.stats.fk_demands_unresolved += nbr_unresolved
+        err = f"FK closure stopped after {self.max_fk_cycle_rounds} rounds with {nbr_unresolved} unresolved FK " \
+              f"tuples ({', '.join(f'{rel_name}: {len(tuples)}' for rel_name, tuples in unresolved.items())}), " \
+              f"violating FK constraints (see unresolved_fk_tuples)"
+        if self.strict_fk:
+            raise FKClosureError(err, self.unresolved_fk_tuples)
+        warnings.warn(err)
+
+    def generate_tuples_from_fk(self, rel_inst, tuples, curr_fk_tuples):
+        nbr_generated = 0
+        with self.timed("fk_closure", rel_inst.name):
+            # drop duplicated partial tuples and those whose PK values are already in rel (FK constraint respected)
+            kept = rel_inst.filter_fk_attr_vals(tuples)
+            seen_fk_vals = {}  # FK values of generated tuples, kept once for all chunks
+            for chunk in self.iter_chunks(kept):
                 # generate full tuple for rel from partial attribute values from FK constraint
-                _, fk_generated = rel_inst.generate_and_feed_tuples(tuples, from_constraint=True)
+                generated, fk_generated = rel_inst.generate_and_feed_tuples(chunk, from_constraint=True,
+                                                                            seen_fk_vals=seen_fk_vals)
+                nbr_generated += len(generated)
+                self.count_fk_demands_emitted(rel_inst, len(generated))
                 # if rel had also FK to another rel2, it also generates partial tuple to complete for rel2
-                for o_rel, o_tuples in fk_generated.items():
-                    if curr_fk_tuples.get(o_rel.name) is None:
-                        curr_fk_tuples[o_rel.name] = o_tuples
-                    else:
-                        curr_fk_tuples[o_rel.name].extend(o_tuples)
+                self.fill_fk_tuples_per_rel(curr_fk_tuples, fk_generated)
+        if self.stats is not None:
+            self.stats.count_fk_demands(len(tuples), len(kept), nbr_generated)
+            self.notify("fk_closure", rel_inst.name, nbr_generated)
+
+    def count_fk_demands_emitted(self, rel_inst, nbr_tuples):
+        # partial FK tuples emitted by nbr_tuples tuples of rel_inst, one per FK, before repeated ones are dropped
+        if self.stats is not None:
+            self.stats.fk_demands_emitted += nbr_tuples * len(rel_inst.get_ind_fixed_attr_in_fk())
 
     def generate_instances(self):
         fk_tuples = {}
         rel_insts = {}  # {relname: RelationInstance} where RelationInstance is the one generated from params
         # generate all regular tuples from instantiation parameters given for each relation
-        for rel, param in self.rels_inst_params:
-            rel_inst, gen_fk_tuples = rel.generate_instance(param[0], param[1], param[2])
-            rel_insts[rel.name] = rel_inst
+        with self.timed("regular"):
+            regular_instances = self.generate_regular_instances()
+        for (_, param), (rel_inst, gen_fk_tuples) in zip(self.rels_inst_params, regular_instances):
+            rel_insts[rel_inst.name] = rel_inst
+            if param[2]:
+                self.count_fk_demands_emitted(rel_inst, rel_inst.nbr_generated)
             # keep all partially generated tuples originated from FK constraints in fk_tuples with entries
             # like relname : [{attr1: val1,..}, {attr1: val1,..}] where {attr1: val1} is a partially generated
             # tuple for relation relname (attr1 was in a FK referencing relname that has attr1 as PK)
-            for o_rel, tuples in gen_fk_tuples.items():
-                already_generated = fk_tuples.get(o_rel.name, None)
-                if not already_generated:
-                    fk_tuples[o_rel.name] = tuples
-                else:
-                    fk_tuples[o_rel.name].extend(tuples)
+            self.fill_fk_tuples_per_rel(fk_tuples, gen_fk_tuples)
         self.rel_insts = rel_insts
-        self.generate_tuples_from_fks(fk_tuples)
+        with self.timed("fk_closure"):
+            self.generate_tuples_from_fks(fk_tuples)
         return rel_insts
 
+    def generate_regular_instances(self):
+        # [(RelationInstance, {Relation or relname: partial FK tuples})] following order of instantiation params
+        if self.cache is None:
+            return self.generate_regular_instances_of(self.rels_inst_params)
+        regular_instances = []
+        to_generate = []  # [(ind in regular_instances, cache key, (rel, param))] not found in cache
+        for rel, param in self.rels_inst_params:
+            key = self.cache.get_key(rel, param)
+            cached = self.cache.load(key)
+            if cached is None:
+                to_generate.append((len(regular_instances), key, (rel, param)))
+                regular_instances.append(None)
+            else:
+                regular_instances.append(self.restore_regular_instance(rel, param, *cached))
+                if self.stats is not None:
+                    self.stats.cache_hits += 1
+        generated = self.generate_regular_instances_of([rel_param for _, _, rel_param in to_generate])
+        for (ind, key, _), (rel_inst, gen_fk_tuples) in zip(to_generate, generated):
+            gen_fk_tuples = {o_rel.name if isinstance(o_rel, Relation) else o_rel: tuples
+                             for o_rel, tuples in gen_fk_tuples.items()}
+            self.cache.store(key, (rel_inst.get_generated_state(), gen_fk_tuples))
+            regular_instances[ind] = (rel_inst, gen_fk_tuples)
+        return regular_instances
+
+    def generate_regular_instances_of(self, rels_inst_params):
+        if self.workers <= 1 or self.sink is not None:
+            regular_instances = []
+            for rel, param in rels_inst_params:
+                with self.timed("regular", rel.name):
+                    regular_instances.append(rel.generate_instance(param[0], param[1], param[2], columnar=self.columnar,
+                                                                   shards=self.shards, context=self.context,
+                                                                   sink=self.sink, chunk_size=self.chunk_size))
+                self.notify("regular", rel.name, regular_instances[-1][0].get_size())
+            return regular_instances
+        tasks = [partial(generate_regular_state, rel, param, self.context) for rel, param in rels_inst_params]
+        generated_states = run_in_processes(tasks, self.workers)
+        return [self.restore_regular_instance(rel, param, state, gen_fk_tuples)
+                for (rel, param), (state, gen_fk_tuples) in zip(rels_inst_params, generated_states)]
+
+    def restore_regular_instance(self, rel, param, state, gen_fk_tuples):
+        rel_inst = rel.create_instance(param[1], columnar=self.columnar, context=self.context)
+        rel_inst.restore_generated_state(state)
+        self.notify("regular", rel.name, rel_inst.get_size())
+        return rel_inst, gen_fk_tuples
+
     # ---- RELATION INSTANCES DEGENERATION ----
 
     def degenerate_inst(self, rel, nbr, fixed_attr=None, selector=None, rdm_selection=False,
@@ -61,18 +195,70 @@ class DBInstance:
                                                          respect_fk_constraint=respect_fk_constraint)
 
     def degenerate_insts(self, insts_deg_params):
+        if self.sink is not None:
+            raise ValueError("Tuples of a database instance streamed to a sink are not kept, cannot degenerate them")
         insts_deg_params = self.treat_degenaration_params(insts_deg_params)
         fk_tuples = {}
         for rel_inst, deg_params in insts_deg_params.items():
             nbr, rdm_slct, selector_fct, fixed_attrs = deg_params
-            tuples_indexes = rel_inst.get_tuples_indexes(nbr, selector=selector_fct, rdm_selection=rdm_slct)
-            _, deg_fk_tuples = rel_inst.degenerate_and_feed_tuples_at_inds(tuples_indexes, fixed_attrs=fixed_attrs,
-                                                                           respect_fk_constraints=self.respect_fk)
+            with self.timed("degeneration"), self.timed("degeneration", rel_inst.name):
+                tuples_indexes = rel_inst.get_tuples_indexes(nbr, selector=selector_fct, rdm_selection=rdm_slct)
+                degenerated, deg_fk_tuples = rel_inst.degenerate_and_feed_tuples_at_inds(
+                    tuples_indexes, fixed_attrs=fixed_attrs, respect_fk_constraints=self.respect_fk)
+            self.notify("degeneration", rel_inst.name, len(degenerated))
+            if self.respect_fk:
+                self.count_fk_demands_emitted(rel_inst, len(degenerated))
             self.fill_fk_tuples_per_rel(fk_tuples, deg_fk_tuples)
-        self.generate_tuples_from_fks(fk_tuples)
+        with self.timed("fk_closure"):
+            self.generate_tuples_from_fks(fk_tuples)
 
     # ---- UTILITIES ----
 
+    def load_ASP(self, source, chunk_size=None, ignore_unknown=False):
+        # feed relation instances of instantiation params (created if not yet) with ASP facts of source, a file or a
+        # directory of files listed in a manifest (see parsers.aspparser), read by chunks of chunk_size facts.
+        # Facts of no relation of params raise a SchemaError, unless ignore_unknown. Attribute generators are then
+        # advanced past loaded tuples, so that tuples generated from now (eg. by degeneration) follow them.
+        from src.parsers.aspparser import iter_source_lines, iter_fact_chunks
+        insts_per_fact = {}
+        for rel, (_, attr_sequence_order, _) in self.rels_inst_params:
+            if rel.name not in self.rel_insts:
+                self.rel_insts[rel.name] = rel.create_instance(attr_sequence_order, columnar=self.columnar,
+                                                               context=self.context)
+            insts_per_fact[rel.name.lower()] = self.rel_insts[rel.name]
+        loaded = {}
+        with self.timed("loading"):
+            for facts in iter_fact_chunks(iter_source_lines(source), chunk_size or self.STREAM_CHUNK_SIZE):
+                for fact_name, rel_facts in groupby(facts, key=itemgetter(0)):
+                    rel_inst = insts_per_fact.get(fact_name)
+                    if rel_inst is None:
+                        if ignore_unknown:
+                            continue
+                        raise SchemaError(f"Facts {fact_name} of no relation among {list(insts_per_fact)}",
+                                          list(insts_per_fact))
+                    nbr = rel_inst.feed_values(map(itemgetter(1), rel_facts))
+                    loaded[rel_inst] = loaded.get(rel_inst, 0) + nbr
+                    self.notify("loading", rel_inst.name, nbr)
+        for rel_inst, nbr in loaded.items():
+            for attr in rel_inst.rel_model.attributes.values():
+                attr.skip_values(nbr)
+
+    def iter_chunks(self, tuples):
+        # tuples by chunks of chunk_size (all at once without chunk_size)
+        if not self.chunk_size:
+            yield tuples
+            return
+        for start in range(0, len(tuples), self.chunk_size):
+            yield tuples[start:start + self.chunk_size]
+
+    def timed(self, phase, rel_name=None):
+        # context timing phase (for relation rel_name) in stats, doing nothing if stats are not collected
+        return nullcontext() if self.stats is None else self.stats.timer(phase, rel_name)
+
+    def notify(self, phase, rel_name, nbr_tuples):
+        if self.stats is not None:
+            self.stats.notify(phase, rel_name, nbr_tuples)
+
     def treat_instantiation_params(self, rels_inst_params):
         for rel, global_params_for_inst in rels_inst_params.items():
             param = global_params_for_inst
@@ -106,25 +292,43 @@ class DBInstance:
 
     def fill_fk_tuples_per_rel(self, curr_fk_tuples_per_rel, new_generated_fk_tuples):
         for o_rel, tuples in new_generated_fk_tuples.items():
-            already_generated = curr_fk_tuples_per_rel.get(o_rel.name, None)
+            o_rel_name = o_rel.name if isinstance(o_rel, Relation) else o_rel
+            already_generated = curr_fk_tuples_per_rel.get(o_rel_name, None)
             if not already_generated:
-                curr_fk_tuples_per_rel[o_rel.name] = tuples
+                curr_fk_tuples_per_rel[o_rel_name] = tuples
             else:
-                curr_fk_tuples_per_rel[o_rel.name].extend(tuples)
+                curr_fk_tuples_per_rel[o_rel_name].extend(tuples)
 
     # ---- GETTERS ----
 
+    def get_fk_graph(self):
+        # {relname: [relnames referenced by FKs]} between relation instances
+        graph = {}
+        for rel_name, rel_inst in self.rel_insts.items():
+            graph[rel_name] = [o_rel.name for o_rel, _ in rel_inst.get_rel_model().fks.values()
+                               if o_rel.name in self.rel_insts]
+        return graph
+
+    def get_fk_closure_schedule(self):
+        # groups of relation names referencing each other in cycle, a group coming before those it references
+        return strongly_connected_components(self.get_fk_graph())
+
     def get_rel_inst(self, rel):
         if isinstance(rel, str):
             return self.rel_insts.get(rel)
         elif isinstance(rel, Relation):
             return self.rel_insts.get(rel.name)
 
-    def repr_ASP(self):
-        s = ""
+    def get_stats_report(self):
+        # generation statistics as a dict (see GenerationStats), None if not collected
+        return None if self.stats is None else self.stats.get_report(self.rel_insts)
+
+    def iter_ASP(self):
         for relinst in self.rel_insts.values():
-            s += relinst.repr_ASP()
-        return s
+            yield from relinst.iter_ASP()
+
+    def repr_ASP(self):
+        return ''.join(self.iter_ASP())
 
     def __str__(self):
         s = f"DBInstance with {len(self.rel_insts)} relation instances, generated from parameters :\n"
@@ -171,3 +375,10 @@ if __name__ == "__main__":
     db = DBInstance({SRel: 10, RRel: 0, TRel: 0})
     print(db)
     # print(db.repr_ASP())
+    seeded_asp = DBInstance({SRel: 10, RRel: 0, TRel: 0}, seed=42).repr_ASP()
+    same_seeded_asp = DBInstance({SRel: 10, RRel: 0, TRel: 0}, seed=42).repr_ASP()
+    print("same seed gives same database :", seeded_asp == same_seeded_asp)
+    db_stats = DBInstance({SRel: 1000, RRel: 10, TRel: 0}, stats=True,
+                          progress=lambda phase, rel_name, nbr: print(f"  {phase} {rel_name} : +{nbr} tuples"))
+    db_stats.degenerate_insts({SRel: 100})
+    print(db_stats.stats, db_stats.get_stats_report()["relations"]["SRel"])
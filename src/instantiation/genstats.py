@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+import time
+
+
+class GenerationStats:
+    # Statistics of a database generation : wall time per phase and per relation, and counters about the FK closure
+    # and PK duplicates. progress, if given, is called as progress(phase, rel_name, nbr_tuples) each time a relation
+    # got tuples during a phase.
+
+    def __init__(self, progress=None):
+        self.progress = progress
+        self.phase_times = {}  # {phase: seconds}
+        self.rel_times = {}  # {rel_name: {phase: seconds}}
+        self.closure_rounds = 0  # rounds of FK closure, summed over all components of FK graph
+        self.fk_demands_emitted = 0  # partial FK tuples emitted by generated tuples, one per tuple and FK
+        self.fk_demands = 0  # distinct ones received by referenced relations (repeated ones dropped when emitted)
+        self.fk_demands_satisfied = 0  # ones already satisfied (duplicated, or PK values already in relation)
+        self.fk_tuples_generated = 0  # tuples generated to satisfy the others
+        self.fk_demands_unresolved = 0  # ones left when FK closure stopped at max_fk_cycle_rounds
+        self.cache_hits = 0  # relation instances loaded from cache instead of generated
+
+    @contextmanager
+    def timer(self, phase, rel_name=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if rel_name is None:
+                self.phase_times[phase] = self.phase_times.get(phase, 0) + seconds
+            else:
+                rel_times = self.rel_times.setdefault(rel_name, {})
+                rel_times[phase] = rel_times.get(phase, 0) + seconds
+
+    def count_fk_demands(self, nbr_demands, nbr_kept, nbr_generated):
+        self.fk_demands += nbr_demands
+        self.fk_demands_satisfied += nbr_demands - nbr_kept
+        self.fk_tuples_generated += nbr_generated
+
+    def notify(self, phase, rel_name, nbr_tuples):
+        if self.progress is not None:
+            self.progress(phase, rel_name, nbr_tuples)
+
+    def get_report(self, rel_insts=None):
+        # all statistics as a dict, with counters from relation instances {rel_name: RelationInstance} if given
+        report = {"phase_times": dict(self.phase_times), "relation_times": {rel: dict(times)
+                                                                            for rel, times in self.rel_times.items()},
+                  "closure_rounds": self.closure_rounds, "fk_demands_emitted": self.fk_demands_emitted,
+                  "fk_demands": self.fk_demands,
+                  "fk_demands_satisfied": self.fk_demands_satisfied, "fk_tuples_generated": self.fk_tuples_generated,
+                  "fk_demands_unresolved": self.fk_demands_unresolved, "cache_hits": self.cache_hits}
+        if rel_insts is not None:
+            report["relations"] = {name: {"tuples": rel_inst.get_size(), "regular": rel_inst.nbr_generated,
+                                          "from_constraints": rel_inst.nbr_constrained,
+                                          "degenerated": rel_inst.nbr_degenerated,
+                                          "pk_duplicates_rejected": rel_inst.nbr_pk_rejected,
+                                          "generator_calls": {attr_name: attr.nbr_drawn for attr_name, attr
+                                                              in rel_inst.rel_model.attributes.items()}}
+                                   for name, rel_inst in rel_insts.items()}
+        return report
+
+    def __str__(self):
+        s = "Generation statistics :\n"
+        for phase, seconds in self.phase_times.items():
+            s += f"  {phase} : {seconds:.3f}s\n"
+        for rel_name, times in self.rel_times.items():
+            s += f"  {rel_name} : " + ', '.join(f"{phase} {seconds:.3f}s" for phase, seconds in times.items()) + '\n'
+        s += f"  FK closure : {self.closure_rounds} rounds, {self.fk_demands_emitted} demands emitted," \
+             f" {self.fk_demands} distinct received ({self.fk_demands_satisfied} already satisfied)," \
+             f" {self.fk_tuples_generated} tuples generated\n"
+        if self.fk_demands_unresolved:
+            s += f"  {self.fk_demands_unresolved} FK demands unresolved (max FK cycle rounds reached)\n"
+        if self.cache_hits:
+            s += f"  {self.cache_hits} relation instances loaded from cache\n"
+        return s
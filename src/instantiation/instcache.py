@@ -0,0 +1,166 @@
+from src.utils.utilfunctions import normalize_gen_param
+import sysconfig
+import hashlib
+import pickle
+import types
+import gzip
+import sys
+import os
+
+CACHE_FORMAT = 4  # to increase when the content stored or the way it is generated changes
+
+
+# code of python itself and of installed packages, assumed unchanged between runs (described by name only)
+LIBRARY_PATHS = tuple(os.path.abspath(path) for path in
+                      {sysconfig.get_paths()[name] for name in ("stdlib", "platstdlib", "purelib", "platlib")})
+
+
+def is_library(obj):
+    module_name = obj.__name__ if isinstance(obj, types.ModuleType) else getattr(obj, "__module__", None)
+    if module_name is None or module_name in sys.builtin_module_names:
+        return True
+    path = getattr(sys.modules.get(module_name), "__file__", None)
+    return path is not None and os.path.abspath(path).startswith(LIBRARY_PATHS)
+
+
+def describe_code(code, names):
+    # stable description of a code object (its repr contains a memory address), nested ones included.
+    # Names of globals (or of attributes) it uses are added to names.
+    names.update(code.co_names)
+    consts = tuple(describe_code(const, names) if hasattr(const, "co_code") else repr(const)
+                   for const in code.co_consts)
+    return code.co_code.hex(), consts, code.co_names
+
+
+def describe_callable(fun, described=None):
+    # stable description of a function, from its code, values it captured and globals it uses (helper functions,
+    # classes, constants, recursively), to know when a generator or code it relies on changed. Library code and
+    # callables already described (in described, ids) are only named.
+    described = set() if described is None else described
+    name = getattr(fun, "__qualname__", type(fun).__qualname__)
+    if is_library(fun) or id(fun) in described:
+        return getattr(fun, "__module__", None), name
+    described.add(id(fun))
+    if isinstance(fun, type):
+        members = [(attr_name, describe_value(getattr(val, "__func__", val), described))
+                   for attr_name, val in sorted(vars(fun).items()) if not attr_name.startswith("__")
+                   or attr_name in ("__init__", "__call__")]
+        return fun.__module__, name, [describe_callable(base, described) for base in fun.__bases__], members
+    code = getattr(fun, "__code__", None)
+    if code is None:  # callable object, as a GeneratorFactory
+        return describe_callable(type(fun), described), describe_value(getattr(fun, "__dict__", None), described)
+    names = set()
+    code_description = describe_code(code, names)
+    captured = [describe_value(cell.cell_contents, described) for cell in fun.__closure__ or ()]
+    defaults = [describe_value(val, described) for val in fun.__defaults__ or ()]
+    bound = describe_value(getattr(fun, "__self__", None), described)
+    used = []
+    for global_name in sorted(names):
+        if global_name not in fun.__globals__:
+            continue
+        val = fun.__globals__[global_name]
+        if isinstance(val, types.ModuleType):  # used through its attributes, among names
+            if not is_library(val):
+                used.append((global_name, [(attr, describe_value(getattr(val, attr), described))
+                                           for attr in sorted(names) if hasattr(val, attr)]))
+        else:
+            used.append((global_name, describe_value(val, described)))
+    return fun.__module__, name, code_description, captured, defaults, bound, used
+
+
+def describe_value(val, described=None):
+    described = set() if described is None else described
+    if isinstance(val, types.ModuleType):
+        return val.__name__
+    if callable(val):
+        return describe_callable(val, described)
+    if isinstance(val, dict):
+        return [(repr(key), describe_value(item, described)) for key, item in val.items()]
+    if isinstance(val, (list, tuple)):
+        return [describe_value(item, described) for item in val]
+    if isinstance(val, (set, frozenset)):  # ordered as their repr, not by hash (differing between processes)
+        return sorted(repr(describe_value(item, described)) for item in val)
+    if type(val).__repr__ is object.__repr__ and hasattr(val, "__dict__"):  # repr would give its memory address
+        return describe_callable(type(val), described), describe_value(vars(val), described)
+    return repr(val)
+
+
+def fingerprint_relation(rel):
+    # everything of a relation schema its regular tuples depend on. Referenced relations are only named,
+    # their own tuples come from the FK closure which is always run again.
+    attrs = [(attr_name, attr.attr_type.value, attr.order, describe_callable(attr.get_generator_fun))
+             for attr_name, attr in rel.attributes.items()]
+    fks = sorted((fk_attrs, o_rel.name, sorted(mapping.items())) for fk_attrs, (o_rel, mapping) in rel.fks.items())
+    return rel.name, attrs, sorted(rel.pk), fks
+
+
+class InstanceCache:
+    # On-disk cache of relation instances generated from instantiation parameters (regular tuples, before the FK
+    # closure), in files named after a fingerprint of the relation schema, its parameters and the generation seed.
+    # Generation being reproducible only with a seed, the cache is only meaningful for a seeded generation.
+    # Generators are fingerprinted with the code and values they use (see describe_callable), but not library code
+    # nor files they read (eg. word lists) : the cache is to clear when these change.
+
+    def __init__(self, cache_dir, seed):
+        self.cache_dir = cache_dir
+        self.seed = seed
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_key(self, rel, inst_param):
+        # inst_param as (inst_params, seq_attr, respect_FK) as treated by DBInstance
+        inst_params, attr_sequence_order, respect_fk = inst_param
+        content = (CACHE_FORMAT, self.seed, fingerprint_relation(rel), normalize_gen_param(inst_params),
+                   attr_sequence_order, respect_fk)
+        return hashlib.blake2b(repr(content).encode(), digest_size=16).hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + ".pickle.gz")
+
+    def load(self, key):
+        # (state as RelationInstance.get_generated_state, {relname: partial FK tuples}), None if not cached
+        try:
+            with gzip.open(self.get_path(key), "rb") as fp:
+                return pickle.load(fp)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def store(self, key, content):
+        # written apart then renamed, so that an interrupted run never leaves a truncated entry
+        path = self.get_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wb", compresslevel=1) as fp:
+            pickle.dump(content, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".pickle.gz"):
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+    def __str__(self):
+        return f"InstanceCache in {self.cache_dir} for seed {self.seed}"
+
+
+if __name__ == "__main__":
+    from src.model.relation import Relation
+    from src.model.attribute import AttributeInfo, AttributeTypes
+    import tempfile
+
+    rel = Relation("Rel", pk="id", attributes={"id": AttributeInfo("id", attr_type=AttributeTypes.incr_int),
+                                               "val": AttributeInfo("val")})
+    cache = InstanceCache(tempfile.mkdtemp(), seed=42)
+    key = cache.get_key(rel, (10, None, True))
+    print(cache, "key :", key, "cached :", cache.load(key))
+    cache.store(key, ([(('1', '2'), False, False)], {}, 0))
+    print("after storing :", cache.load(key))
+    print("other parameters give other key :", key != cache.get_key(rel, (11, None, True)))
+    rel.add_attribute(AttributeInfo("other", attr_type=AttributeTypes.str))
+    print("changed schema gives other key :", key != cache.get_key(rel, (10, None, True)))
+    cache.clear()
+    import src.model.generators as generators
+    attr_key = cache.get_key(rel, (10, None, True))
+    draw = generators.RdmInt.value_from_draw
+    generators.RdmInt.value_from_draw = lambda self, draw: "changed"  # default int generator code changed
+    print("changed generator code gives other key :", attr_key != cache.get_key(rel, (10, None, True)))
+    generators.RdmInt.value_from_draw = draw
+    print("restored code gives same key :", attr_key == cache.get_key(rel, (10, None, True)))
@@ -11,7 +11,7 @@ class TableParameters:
         self.respect_fk = respect_fk
         self.part_deg = part_deg
         self.rdm_slct = rdm_slct
-        self.selector = selector
+        self.selector = selector  # function of a tuple triple, or predicates.Predicate
         self.fixed_attr_deg = fixed_attr_deg
 
     def get_instantiation_params(self):
@@ -59,7 +59,7 @@ class GlobalParameters:
         self.respect_fk = respect_fk
         self.part_deg = part_deg
         self.rdm_slct = rdm_slct
-        self.selector = selector
+        self.selector = selector  # function of a tuple triple, or predicates.Predicate
         self.fixed_attr_deg = fixed_attr_deg
 
     def deduce_table_parameter(self, o_rel_table_params):
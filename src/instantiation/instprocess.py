@@ -5,7 +5,12 @@ from src.instantiation.dbinstance import DBInstance
 
 class InstantiationProcess:
 
-    def __init__(self, rels_table_params, dflt_param=GlobalParameters(0)):
+    def __init__(self, rels_table_params, dflt_param=GlobalParameters(0), seed=None, cache_dir=None, stats=False,
+                 progress=None):
+        self.seed = seed  # seed of the generation, None for a different database at each instantiation
+        self.cache_dir = cache_dir  # directory caching relation instances between seeded instantiations
+        self.stats = stats  # collect timings and counters of generation, progress(phase, relname, nbr) called if given
+        self.progress = progress
         self.rel_table_params = self.treat_rels_table_params(rels_table_params)
         self.set_default_rels_table_params(dflt_param)  # to {Relation : TableParameters}, ready to instantiate
         self.db = None
@@ -14,7 +19,8 @@ class InstantiationProcess:
         rels_inst_params = {}
         for rel, table_params in self.rel_table_params.items():
             rels_inst_params[rel] = table_params.get_instantiation_params()
-        self.db = DBInstance(rels_inst_params)
+        self.db = DBInstance(rels_inst_params, seed=self.seed, cache_dir=self.cache_dir, stats=self.stats,
+                             progress=self.progress)
 
     def denegerate_db(self):
         rels_deg_params = {}
@@ -22,6 +28,9 @@ class InstantiationProcess:
             rels_deg_params[rel] = table_params.get_degeneration_params()
         self.db.degenerate_insts(rels_deg_params)
 
+    def get_stats_report(self):
+        return None if self.db is None else self.db.get_stats_report()
+
     def set_default_rels_table_params(self, dflt_param):
         if isinstance(dflt_param, GlobalParameters):  # default parameter for each table has to be derived
             dflt_param = dflt_param.deduce_table_parameter(self.rel_table_params.items())
@@ -0,0 +1,238 @@
+from abc import ABC, abstractmethod
+from itertools import repeat
+import operator
+
+# Declarative selectors of tuples of a relation instance, usable instead of selector functions (see
+# RelationInstance.get_tuples_indexes). A predicate is built from attribute comparisons and flags, as
+#   (Attr("role") == "professor") & Attr("faculty").isin(["EII", "SHS"]) & ~FROM_CONSTRAINT
+# then compiled against the fixed attributes of an instance to be evaluated on whole columns at once :
+# masks of booleans are computed with map() over columns, without a Python call per tuple.
+
+COMPARISONS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt,
+               ">=": operator.ge}
+
+
+class Predicate(ABC):
+
+    def compile(self, attribute_fix):
+        # CompiledPredicate evaluating this predicate on tuples of values for attributes attribute_fix
+        return CompiledPredicate(self, list(attribute_fix))
+
+    @abstractmethod
+    def get_mask(self, columns, nbr):
+        # [bool] for nbr tuples, columns as a ColumnsChunk giving values of attributes and flags of these tuples
+        pass
+
+    def get_attributes(self):
+        return set()
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+
+class Comparison(Predicate):
+    # value of attribute compared to a constant, numerically if the constant is a number (values being strings)
+
+    def __init__(self, attr_name, op, value):
+        self.attr_name = attr_name
+        self.op = op
+        self.value = value
+
+    def get_mask(self, columns, nbr):
+        column = columns.get_values(self.attr_name)
+        value = self.value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return self.get_numeric_mask(column, value, nbr)
+        return list(map(COMPARISONS[self.op], column, repeat(str(value), nbr)))
+
+    def get_numeric_mask(self, column, value, nbr):
+        # values compared as integers if they all are (exactly), else as floats, values that are not numbers
+        # (eg. "n/a") never matching
+        compare = COMPARISONS[self.op]
+        try:
+            return list(map(compare, map(type(value), column), repeat(value, nbr)))
+        except ValueError:
+            numbers = map(to_number, column)
+            return [number is not None and compare(number, value) for number in numbers]
+
+    def get_attributes(self):
+        return {self.attr_name}
+
+    def __str__(self):
+        return f"{self.attr_name} {self.op} {self.value!r}"
+
+
+def to_number(value):
+    # value as a float, None if it is not a number
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Membership(Predicate):
+
+    def __init__(self, attr_name, values):
+        self.attr_name = attr_name
+        self.values = frozenset(map(str, values))
+
+    def get_mask(self, columns, nbr):
+        return list(map(self.values.__contains__, columns.get_values(self.attr_name)))
+
+    def get_attributes(self):
+        return {self.attr_name}
+
+    def __str__(self):
+        return f"{self.attr_name} in {sorted(self.values)}"
+
+
+class Flag(Predicate):
+    # tuple flag, from_constraint or degenerated
+
+    def __init__(self, flag_name):
+        self.flag_name = flag_name
+
+    def get_mask(self, columns, nbr):
+        return columns.get_flags(self.flag_name)
+
+    def __str__(self):
+        return self.flag_name
+
+
+class And(Predicate):
+
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def get_mask(self, columns, nbr):
+        mask = self.predicates[0].get_mask(columns, nbr)
+        for predicate in self.predicates[1:]:
+            mask = list(map(operator.and_, mask, predicate.get_mask(columns, nbr)))
+        return mask
+
+    def get_attributes(self):
+        return set().union(*(predicate.get_attributes() for predicate in self.predicates))
+
+    def __str__(self):
+        return '(' + " and ".join(map(str, self.predicates)) + ')'
+
+
+class Or(And):
+
+    def get_mask(self, columns, nbr):
+        mask = self.predicates[0].get_mask(columns, nbr)
+        for predicate in self.predicates[1:]:
+            mask = list(map(operator.or_, mask, predicate.get_mask(columns, nbr)))
+        return mask
+
+    def __str__(self):
+        return '(' + " or ".join(map(str, self.predicates)) + ')'
+
+
+class Not(Predicate):
+
+    def __init__(self, predicate):
+        self.predicate = predicate
+
+    def get_mask(self, columns, nbr):
+        return list(map(operator.not_, self.predicate.get_mask(columns, nbr)))
+
+    def get_attributes(self):
+        return self.predicate.get_attributes()
+
+    def __str__(self):
+        return f"not {self.predicate}"
+
+
+class Attr:
+    # attribute to build comparisons from
+
+    def __init__(self, attr_name):
+        self.attr_name = attr_name
+
+    def isin(self, values):
+        return Membership(self.attr_name, values)
+
+    def __eq__(self, value):
+        return Comparison(self.attr_name, "==", value)
+
+    def __ne__(self, value):
+        return Comparison(self.attr_name, "!=", value)
+
+    def __lt__(self, value):
+        return Comparison(self.attr_name, "<", value)
+
+    def __le__(self, value):
+        return Comparison(self.attr_name, "<=", value)
+
+    def __gt__(self, value):
+        return Comparison(self.attr_name, ">", value)
+
+    def __ge__(self, value):
+        return Comparison(self.attr_name, ">=", value)
+
+    __hash__ = None
+
+
+FROM_CONSTRAINT = Flag("from_constraint")
+DEGENERATED = Flag("degenerated")
+
+
+class ColumnsChunk:
+    # values of some attributes and flags for consecutive tuples, as lists (one per attribute). Flags are only
+    # got, by get_flags(flag_name), when the predicate uses them.
+
+    def __init__(self, columns, get_flags):
+        self.columns = columns  # {attr_name: [values]}
+        self.get_flags = get_flags
+
+    def get_values(self, attr_name):
+        return self.columns[attr_name]
+
+
+class CompiledPredicate:
+    # predicate checked against fixed attributes of tuples, evaluated over chunks of columns or on a single triple
+
+    def __init__(self, predicate, attribute_fix):
+        unknown = predicate.get_attributes().difference(attribute_fix)
+        if unknown:
+            raise ValueError(f"Predicate {predicate} uses attributes {sorted(unknown)} not in {attribute_fix}")
+        self.predicate = predicate
+        self.attr_indexes = {attr_name: attribute_fix.index(attr_name) for attr_name in predicate.get_attributes()}
+
+    def get_mask(self, get_column, get_flags, nbr):
+        # get_column(ind_attr) and get_flags(flag_name) give lists of values and flags of nbr tuples
+        columns = {attr_name: get_column(ind) for attr_name, ind in self.attr_indexes.items()}
+        return self.predicate.get_mask(ColumnsChunk(columns, get_flags), nbr)
+
+    def __call__(self, triple):
+        # evaluation on a single (tuple_of_values, from_constraint, degenerated) triple, as selector functions
+        values, from_constraint, degenerated = triple
+        columns = {attr_name: [values[ind]] for attr_name, ind in self.attr_indexes.items()}
+        flags = {"from_constraint": [from_constraint], "degenerated": [degenerated]}
+        return self.predicate.get_mask(ColumnsChunk(columns, flags.__getitem__), 1)[0]
+
+    def __str__(self):
+        return f"compiled {self.predicate}"
+
+
+if __name__ == "__main__":
+    predicate = ((Attr("age") >= 30) & Attr("city").isin(["Paris", "Lyon"])) | DEGENERATED
+    compiled = predicate.compile(["name", "age", "city"])
+    print(compiled)
+    triples = [(("Ann", "25", "Paris"), False, False), (("Bob", "42", "Lyon"), True, False),
+               (("Cid", "37", "Nice"), False, True), (("Dan", "31", "Paris"), False, False)]
+    print([compiled(triple) for triple in triples])
+    columns = list(zip(*(values for values, _, _ in triples)))
+    flags = {"from_constraint": [t[1] for t in triples], "degenerated": [t[2] for t in triples]}
+    print(compiled.get_mask(lambda ind: columns[ind], flags.__getitem__, len(triples)))
+    print((~FROM_CONSTRAINT & (Attr("name") != "Dan")).compile(["name"])(triples[3]))
+    prices = ColumnsChunk({"price": ["9.32", "12", "n/a", "10"]}, None)
+    print("price > 10 :", (Attr("price") > 10).get_mask(prices, 4),
+          "price != 10 :", (Attr("price") != 10).get_mask(prices, 4))
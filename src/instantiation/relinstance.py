@@ -1,6 +1,9 @@
 from src.utils.utilfunctions import get_indexes
+from src.instantiation.tuplestorage import ColumnarTuples, StreamedTuples, PKIndex
+from src.instantiation.predicates import Predicate
 from operator import add, sub, itemgetter
 from functools import reduce
+from itertools import groupby, islice, cycle, compress
 import random
 
 
@@ -11,16 +14,48 @@ class SchemaError(ValueError):
         self.schema = schema
 
 
+class KeyDomainError(ValueError):
+    # raised when distinct PK values can't be generated for all requested tuples
+
+    def __init__(self, msg, relation):
+        super().__init__(msg)
+        self.relation = relation
+
+
+def asp_fact_lines(fact_name, tuples_values):
+    # one ASP fact (as a line) per tuple of values
+    for values in tuples_values:
+        yield f"{fact_name}({','.join(values).lower()}).\n"
+
+
 class RelationInstance:
+    # nbr of tuples generated again as duplicating PK values without getting any new PK value before giving up,
+    # if the nbr of distinct PK values is unknown (10 times the nbr of distinct PK values otherwise)
+    MAX_FRUITLESS_RETRIES = 10000
+    SELECTION_CHUNK_SIZE = 65536  # tuples whose columns are evaluated at once by selection predicates
 
-    def __init__(self, rel_model, attribute_fix):
+    def __init__(self, rel_model, attribute_fix, columnar=False, rng=None, sink=None):
         self.rel_model = rel_model
         self.name = rel_model.name
         self.attribute_fix = attribute_fix
-        self.tuples = []
+        # list of (tuple_of_values, from_constraint, degenerated), or its compact column by column equivalent,
+        # or if streamed to a sink, only the count of tuples written to it (then only PK values are kept)
+        if sink is not None:
+            self.tuples = StreamedTuples(sink, self)
+        else:
+            self.tuples = ColumnarTuples(len(attribute_fix)) if columnar else []
+        self.gen_plan = rel_model.get_generation_plan(attribute_fix)
+        self.pk_indexes = self.get_indexes_in_fixed_attr()
+        # getters of PK values (as a single value if PK has one attribute) in a tuple and in {attr: val} dict
+        self.pk_getter = itemgetter(*self.pk_indexes) if self.pk_indexes else None
+        self.pk_attr_getter = itemgetter(*(attribute_fix[ind] for ind in self.pk_indexes)) if self.pk_indexes else None
+        # PK values of fed tuples, as returned by get_pk_values, compactly for compact or streamed tuples
+        self.pk_index = PKIndex() if columnar or sink is not None else set()
         self.nbr_generated = 0
         self.nbr_constrained = 0
         self.nbr_degenerated = 0
+        self.nbr_pk_rejected = 0  # generated tuples discarded as duplicating PK values
+        self.rng = random if rng is None else rng  # draws selecting tuples, RandomStream for reproducible ones
 
     # ---- TUPLES GENERATION AND FEEDING ----
 
@@ -28,6 +63,9 @@ class RelationInstance:
         tuples = [tuples] if not isinstance(tuples, list) else tuples
         formated_tuples = []
         for one_tuple_base in tuples:
+            if tuple not in map(type, one_tuple_base):  # only values given, no attribute name to check
+                formated_tuples.append((tuple(one_tuple_base), from_constraint, degenerated))
+                continue
             only_values = []
             for i, attr_val in enumerate(one_tuple_base):
                 if isinstance(attr_val, tuple):  # so first item should be attribute name
@@ -40,44 +78,159 @@ class RelationInstance:
                     only_values.append(attr_val)
             formated_tuples.append((tuple(only_values), from_constraint, degenerated))
         self.tuples.extend(formated_tuples)
+        self.index_pk_values(formated_tuples)
         self.adjust_tuple_nbrs(len(formated_tuples), from_constraint, degenerated)
 
-    def generate_new_tuple(self, given_attr_values, keep_attr_name=False, respect_pk=True, o_tuples_to_insert=None):
-        o_tuples_to_insert = [] if o_tuples_to_insert is None else o_tuples_to_insert  # in case grouped insertion
-        generated_tuple = self.rel_model.generate_tuple(given_attr_values, self.attribute_fix, keep_attr_name)
-        if respect_pk:
-            indexes_pk_in_fix = self.get_indexes_in_fixed_attr()
+    def feed_values(self, tuples_values, from_constraint=False, degenerated=False):
+        # as feed_tuples, for tuples of values only (as tuples of strings), checked by their size. Return their nbr.
+        formated_tuples = [(values, from_constraint, degenerated) for values in tuples_values]
+        if any(len(values) != len(self.attribute_fix) for values, _, _ in formated_tuples):
+            err = f"Given tuples of {self.name} don't all have {len(self.attribute_fix)} values"
+            raise SchemaError(err, self.attribute_fix)
+        self.tuples.extend(formated_tuples)
+        self.index_pk_values(formated_tuples)
+        self.adjust_tuple_nbrs(len(formated_tuples), from_constraint, degenerated)
+        return len(formated_tuples)
+
+    def index_pk_values(self, formated_tuples):
+        if self.pk_indexes:
+            self.pk_index.update(map(self.pk_getter, map(itemgetter(0), formated_tuples)))
+
+    def generate_new_tuple(self, given_attr_values, keep_attr_name=False, respect_pk=True, pending_pk_values=None):
+        # pending_pk_values is the set of PK values of tuples generated but not yet fed (in case grouped insertion)
+        generated_tuple = self.gen_plan.generate_tuple(given_attr_values, keep_attr_name)
+        if respect_pk and self.pk_indexes:
             # get values from the generated tuples for attributes in the fixed ones also in the PK from the relation
-            values_gen_for_pk = itemgetter(*indexes_pk_in_fix)(generated_tuple)
-            if keep_attr_name:
-                values_gen_for_pk = itemgetter(1)(values_gen_for_pk)
-            for tup in o_tuples_to_insert:
-                if itemgetter(*indexes_pk_in_fix)(tup) == values_gen_for_pk:
-                    return None  # Duplicate from the PK point of view
-            for tup, _, _ in self.tuples:
-                if itemgetter(*indexes_pk_in_fix)(tup) == values_gen_for_pk:
-                    return None  # Duplicate from the PK point of view
+            values_gen_for_pk = self.get_pk_values(generated_tuple, keep_attr_name)
+            if values_gen_for_pk in self.pk_index:
+                self.nbr_pk_rejected += 1
+                return None  # Duplicate from the PK point of view
+            if pending_pk_values is not None:
+                if values_gen_for_pk in pending_pk_values:
+                    self.nbr_pk_rejected += 1
+                    return None
+                pending_pk_values.add(values_gen_for_pk)
         return generated_tuple
 
-    def generate_new_tuples(self, given_attr_values_list, keep_attr_name=False, respect_pk=True):
+    def generate_new_tuples(self, given_attr_values_list, keep_attr_name=False, respect_pk=True,
+                            retry_pk_duplicates=False, origins=None):
+        # tuples are generated all at once (column by column), then those duplicating a PK value are discarded,
+        # or generated again if retry_pk_duplicates (unless all their PK values are given)
+        # origins, if given, is a list receiving the position in given_attr_values_list of each generated tuple
+        if retry_pk_duplicates and respect_pk and self.pk_indexes:
+            return self.generate_new_tuples_retrying(given_attr_values_list, keep_attr_name, origins)
+        generated = self.gen_plan.generate_tuples(given_attr_values_list, keep_attr_name)
+        if not(respect_pk and self.pk_indexes):
+            if origins is not None:
+                origins.extend(range(len(generated)))
+            return generated
         gen_tuples = []
-        for given_vals in given_attr_values_list:
-            generated_tuple = self.generate_new_tuple(given_vals, keep_attr_name=keep_attr_name,
-                                                      respect_pk=respect_pk, o_tuples_to_insert=gen_tuples)
-            if generated_tuple is not None:
+        pending_pk_values = set()
+        for pos, generated_tuple in enumerate(generated):
+            values_gen_for_pk = self.get_pk_values(generated_tuple, keep_attr_name)
+            if not(values_gen_for_pk in self.pk_index or values_gen_for_pk in pending_pk_values):
+                pending_pk_values.add(values_gen_for_pk)
                 gen_tuples.append(generated_tuple)
+                if origins is not None:
+                    origins.append(pos)
+        self.nbr_pk_rejected += len(generated) - len(gen_tuples)
+        return gen_tuples
+
+    def generate_new_tuples_retrying(self, given_attr_values_list, keep_attr_name=False, origins=None):
+        pk_attrs = [self.attribute_fix[ind] for ind in self.pk_indexes]
+        domain_size = self.check_pk_domain(sum(1 for given in given_attr_values_list
+                                               if all(given.get(attr) is None for attr in pk_attrs)))
+        max_fruitless_retries = self.MAX_FRUITLESS_RETRIES if domain_size is None else 10 * domain_size
+        gen_tuples = []
+        pending_pk_values = set()
+        to_generate = given_attr_values_list
+        positions = range(len(given_attr_values_list))  # position of each given values to generate in the list
+        fruitless_retries = 0
+        while to_generate:
+            rejected, rejected_positions = [], []
+            generated = self.gen_plan.generate_tuples(to_generate, keep_attr_name)
+            for given, pos, generated_tuple in zip(to_generate, positions, generated):
+                values_gen_for_pk = self.get_pk_values(generated_tuple, keep_attr_name)
+                if values_gen_for_pk in self.pk_index or values_gen_for_pk in pending_pk_values:
+                    self.nbr_pk_rejected += 1
+                    if not all(given.get(attr) is not None for attr in pk_attrs):
+                        rejected.append(given)
+                        rejected_positions.append(pos)
+                else:
+                    pending_pk_values.add(values_gen_for_pk)
+                    gen_tuples.append(generated_tuple)
+                    if origins is not None:
+                        origins.append(pos)
+            fruitless_retries = fruitless_retries + len(rejected) if len(rejected) == len(to_generate) else 0
+            if fruitless_retries >= max_fruitless_retries:
+                raise KeyDomainError(f"No new PK value for {self.name} after generating {fruitless_retries} tuples"
+                                     f" again, PK generators seem to have exhausted their values", self.rel_model)
+            to_generate, positions = rejected, rejected_positions
         return gen_tuples
 
+    def check_pk_domain(self, nbr_tuples):
+        # raise KeyDomainError if PK generators can't give nbr_tuples more distinct PK values, return the nbr
+        # of distinct PK values they can give (None if unknown)
+        domain_size = 1
+        for ind in self.pk_indexes:
+            attr_domain_size = self.rel_model.attributes[self.attribute_fix[ind]].get_domain_size()
+            if attr_domain_size is None:
+                return None
+            domain_size *= attr_domain_size
+        if len(self.pk_index) + nbr_tuples > domain_size:
+            raise KeyDomainError(f"Cannot generate {nbr_tuples} tuples with distinct PK values in {self.name}"
+                                 f" ({len(self.pk_index)} already present), PK generators can only give"
+                                 f" {domain_size} distinct values", self.rel_model)
+        return domain_size
+
     def generate_and_feed_tuples(self, given_attr_values_list, from_constraint=False, degenerated=False,
-                                 respect_fk_constraint=True, respect_pk=True):
-        generated = self.generate_new_tuples(given_attr_values_list, respect_pk=respect_pk)
+                                 respect_fk_constraint=True, respect_pk=True, retry_pk_duplicates=False, origins=None,
+                                 seen_fk_vals=None):
+        # seen_fk_vals as in generate_fk_attr_vals, to not return FK values already returned for previous tuples
+        generated = self.generate_new_tuples(given_attr_values_list, respect_pk=respect_pk,
+                                             retry_pk_duplicates=retry_pk_duplicates, origins=origins)
         self.feed_tuples(generated, from_constraint, degenerated)
         # if some fixed attributes constitute a FK, should return tuples to respect it
         if not respect_fk_constraint:
             return generated, {}
-        o_rel_fk_attr_values = self.generate_fk_attr_vals(generated)
+        o_rel_fk_attr_values = self.generate_fk_attr_vals(generated, seen_fk_vals)
         return generated, o_rel_fk_attr_values
 
+    def get_generated_state(self):
+        # picklable content of this instance, as (list of (values, from_constraint, degenerated), nbr of values
+        # drawn per attribute, nbr of tuples rejected as PK duplicates), to rebuild it with restore_generated_state
+        draws = {attr_name: attr_info.nbr_drawn for attr_name, attr_info in self.rel_model.attributes.items()}
+        return list(self.tuples), draws, self.nbr_pk_rejected
+
+    def restore_generated_state(self, state, respect_pk=False, rejected=None):
+        # feed tuples from a state of an instance of the same relation, then advance attribute generators
+        # so that tuples generated from now on follow the ones of the state. Return values of fed tuples.
+        # rejected, if given, is a list receiving the positions in state of tuples discarded as PK duplicates
+        triples, draws, nbr_pk_rejected = state
+        self.nbr_pk_rejected += nbr_pk_rejected
+        fed = []
+        start = 0
+        for (from_constraint, degenerated), group in groupby(triples, key=itemgetter(1, 2)):
+            tuples = [values for values, _, _ in group]
+            if respect_pk and self.pk_indexes:  # discard tuples duplicating PK values of already fed ones
+                kept, pending_pk_values = [], set()
+                for pos, tup in enumerate(tuples, start):
+                    pk_values = self.pk_getter(tup)
+                    if not(pk_values in self.pk_index or pk_values in pending_pk_values):
+                        pending_pk_values.add(pk_values)
+                        kept.append(tup)
+                    elif rejected is not None:
+                        rejected.append(pos)
+                self.nbr_pk_rejected += len(tuples) - len(kept)
+                start += len(tuples)
+                tuples = kept
+            self.feed_tuples(tuples, from_constraint, degenerated)
+            fed.extend(tuples)
+        for attr_name, nbr in draws.items():
+            attr_info = self.rel_model.attributes[attr_name]
+            attr_info.skip_values(nbr - attr_info.nbr_drawn)
+        return fed
+
     # ---- TUPLES DEGENERATION ----
 
     def form_given_attr_values(self, from_tuple, fixed_attrs_list):
@@ -109,30 +262,41 @@ class RelationInstance:
 
     # ---- TUPLES GENERATION FROM FK CONSTRAINTS ----
 
-    def generate_fk_attr_vals(self, fed_tuples):
-        o_rel_tuples_fk = {}  # to feed as {Relation: [{attr1: val1,..}, {attr1: val1,..}], Relation2: [FK attr vals], }
+    def generate_fk_attr_vals(self, fed_tuples, seen_fk_vals=None):
+        # to feed as {Relation: [{attr1: val1,..}, {attr1: val1,..}], Relation2: [FK attr vals], }
+        # where each distinct partial tuple appears once for a referenced relation. seen_fk_vals, given to calls for
+        # successive chunks of tuples, keeps FK values across them : each appears once for all chunks.
+        o_rel_tuples_fk = {}
+        # {(Relation, attr_names_in_o_rel): set of FK values already kept}
+        seen_fk_vals = {} if seen_fk_vals is None else seen_fk_vals
         for ind_attr_fk, rel_mapping in self.get_ind_fixed_attr_in_fk().items():
             rel, attr_names_mapping = rel_mapping
-            for tup in fed_tuples:
-                # keep subset of generated tuple values considering only attributes in FK referencing rel
-                tup_fk_val = itemgetter(*ind_attr_fk)(tup)
-                tup_fk_attr = itemgetter(*ind_attr_fk)(self.attribute_fix)
-                if not isinstance(tup_fk_attr, tuple):
-                    #  itemgetter does not return tuple if response is a standalone element
-                    tup_fk_val = (tup_fk_val,)
-                    tup_fk_attr = (tup_fk_attr,)
-                dict_attr_val = {}
-                for ind in range(len(ind_attr_fk)):
-                    # rebuilding unordered dict {attr1: val1, attr2: val2, ..} where attrN belongs to FK to rel
-                    name_attr_in_o_rel = attr_names_mapping[tup_fk_attr[ind]]
-                    attr, val = name_attr_in_o_rel, tup_fk_val[ind]
-                    dict_attr_val[attr] = val
-                if o_rel_tuples_fk.get(rel) is None:
-                    o_rel_tuples_fk[rel] = [dict_attr_val]
-                else:
-                    o_rel_tuples_fk[rel].append(dict_attr_val)
+            # attributes in FK as named in rel, sorted so that FKs on same attributes of rel share their values
+            named_inds = sorted((attr_names_mapping[self.attribute_fix[ind]], ind) for ind in ind_attr_fk)
+            o_attr_names = tuple(attr for attr, _ in named_inds)
+            # keep subset of generated tuple values considering only attributes in FK referencing rel
+            fk_vals_getter = itemgetter(*(ind for _, ind in named_inds))
+            seen = seen_fk_vals.setdefault((rel, o_attr_names), set())
+            for tup_fk_val in map(fk_vals_getter, fed_tuples):
+                if tup_fk_val in seen:
+                    continue
+                seen.add(tup_fk_val)
+                #  itemgetter does not return tuple if response is a standalone element
+                tup_fk_val = tup_fk_val if len(o_attr_names) > 1 else (tup_fk_val,)
+                # rebuilding unordered dict {attr1: val1, attr2: val2, ..} where attrN belongs to FK to rel
+                o_rel_tuples_fk.setdefault(rel, []).append(dict(zip(o_attr_names, tup_fk_val)))
         return o_rel_tuples_fk
 
+    def filter_fk_attr_vals(self, given_attr_values_list):
+        # keep once each distinct partial tuple whose (fully valued) PK values aren't already in this instance
+        kept, seen = [], set()
+        for given_attr_values in given_attr_values_list:
+            key = tuple(sorted(given_attr_values.items()))
+            if not(key in seen or self.contains_pk_values(given_attr_values)):
+                seen.add(key)
+                kept.append(given_attr_values)
+        return kept
+
     # ---- UTILITIES ----
 
     def adjust_tuple_nbrs(self, nbr, from_constraint, degenerated, adding=True):
@@ -152,52 +316,76 @@ class RelationInstance:
     # ---- GETTERS ----
 
     def get_tuples_indexes(self, nbr, selector=None, rdm_selection=False):
-        if nbr <= self.get_size():
-            enough = (True, 0)
-        else:
-            enough = (False, nbr - self.get_size())
-            nbr = self.get_size()
-        poss_indexes = list(range(self.get_size()))
-        if rdm_selection:
-            random.shuffle(poss_indexes)
-        if selector is None:
-            slcted = poss_indexes[:nbr]
-        else:
-            slcted = []
-            for ind in poss_indexes:
-                if len(slcted) >= nbr:
-                    return slcted
-                ind_to_check = poss_indexes[ind]
-                if selector(self[ind_to_check]):
-                    slcted.append(ind_to_check)
-        if not enough[0]:  # need to repick additional indexes in the selected ones
-            times_whole_slcted, remaining = divmod(enough[1], len(slcted))
-            slcted.extend(slcted*times_whole_slcted + slcted[:remaining])
+        # indexes of nbr tuples, picked randomly or in order, among tuples respecting selector if given, as a function
+        # of a (tuple_of_values, from_constraint, degenerated) triple or a Predicate evaluated over columns.
+        # If nbr exceeds the nbr of tuples of the instance, picked indexes are repeated for the nbr of missing ones.
+        slcted = self.get_tuples_indexes2(nbr, selector, rdm_selection)
+        if slcted and nbr > self.get_size():  # need to repick additional indexes in the selected ones
+            slcted.extend(islice(cycle(slcted), nbr - self.get_size()))
         return slcted
 
     def get_tuples_indexes2(self, nbr, selector=None, rdm_selection=False):
-        nbr = min(nbr, self.get_size())
-        poss_indexes = list(range(self.get_size()))
-        if rdm_selection:
-            random.shuffle(poss_indexes)
+        # as get_tuples_indexes, but at most one time each index
+        return list(islice(self.iter_selectable_indexes(nbr, selector, rdm_selection), nbr))
+
+    def iter_selectable_indexes(self, nbr, selector=None, rdm_selection=False):
+        # indexes of tuples respecting selector, in order or random order, computed lazily so that picking the first
+        # nbr ones costs O(nbr) without selector (as many calls to selector as tuples checked before nbr found)
+        size = self.get_size()
         if selector is None:
-            return poss_indexes[:nbr]
-        slcted = []
-        for ind in poss_indexes:
-            if len(slcted) >= nbr:
-                return slcted
-            ind_to_check = poss_indexes[ind]
-            if selector(self[ind_to_check]):
-                slcted.append(ind_to_check)
-        return slcted
+            if rdm_selection:
+                return iter(self.rng.sample(range(size), min(nbr, size)))
+            return iter(range(min(nbr, size)))
+        if isinstance(selector, Predicate):
+            matching = self.iter_matching_indexes(selector.compile(self.attribute_fix))
+            if rdm_selection:
+                matching = list(matching)
+                return iter(self.rng.sample(matching, min(nbr, len(matching))))
+            return matching
+        order = self.iter_random_indexes(size) if rdm_selection else range(size)
+        return (ind for ind in order if selector(self[ind]))
+
+    def iter_matching_indexes(self, compiled_predicate):
+        # indexes of tuples matching a CompiledPredicate, evaluated over columns of SELECTION_CHUNK_SIZE tuples
+        size = self.get_size()
+        for start in range(0, size, self.SELECTION_CHUNK_SIZE):
+            stop = min(start + self.SELECTION_CHUNK_SIZE, size)
+            get_column, get_flags = self.get_columns_getters(start, stop)
+            yield from compress(range(start, stop), compiled_predicate.get_mask(get_column, get_flags, stop - start))
+
+    def get_columns_getters(self, start, stop):
+        # functions giving values of a fixed attribute (by index) and flags (by name) of tuples from start to stop
+        if isinstance(self.tuples, ColumnarTuples):
+            return (lambda ind: self.tuples.get_column(ind, start, stop),
+                    lambda flag_name: self.tuples.get_flags(flag_name, start, stop))
+        triples = self.tuples[start:stop]
+        flag_inds = {"from_constraint": 1, "degenerated": 2}
+        return (lambda ind: [values[ind] for values, _, _ in triples],
+                lambda flag_name: list(map(itemgetter(flag_inds[flag_name]), triples)))
+
+    def iter_random_indexes(self, size):
+        # all indexes of range(size) in random order, drawn one by one while mostly new, so that the first ones
+        # are got without shuffling them all. The remaining ones are shuffled once half of them were drawn.
+        drawn = set()
+        while len(drawn) < size // 2:
+            ind = self.rng.randrange(size)
+            if ind not in drawn:
+                drawn.add(ind)
+                yield ind
+        remaining = [ind for ind in range(size) if ind not in drawn]
+        self.rng.shuffle(remaining)
+        yield from remaining
 
     def get_tuples(self, nbr, only_values=True, selector=lambda tuple_info: True, rdm=False, in_subset=None):
+        # among nbr tuples (picked randomly or in order in in_subset indexes if given), those respecting selector
+        if isinstance(selector, Predicate):
+            selector = selector.compile(self.attribute_fix)
+        indexes = range(self.get_size()) if in_subset is None else in_subset
+        nbr = min(nbr, len(indexes))
+        indexes = self.rng.sample(indexes, nbr) if rdm else indexes[:nbr]
         result = []
-        indexes = range(self.get_size()) if in_subset is None else in_subset.copy()
-        if rdm:
-            random.shuffle(indexes)
-        for i in range(min(nbr, len(indexes))):
-            test_tuple = self.tuples[indexes[i]]
+        for ind in indexes:
+            test_tuple = self.tuples[ind]
             if selector(test_tuple):
                 result.append(test_tuple[0] if only_values else test_tuple)
         return result
@@ -205,6 +393,25 @@ class RelationInstance:
     def get_size(self):
         return len(self.tuples)
 
+    def is_streamed(self):
+        return isinstance(self.tuples, StreamedTuples)
+
+    def get_pk_values(self, tup, keep_attr_name=False):
+        # PK values of a fixed tuple, ordered following the fixed attributes
+        if keep_attr_name:
+            tup = tuple(map(itemgetter(1), tup))
+        return self.pk_getter(tup)
+
+    def contains_pk_values(self, given_attr_values):
+        # True if given (partial) attribute values fully value the PK and a fed tuple already has these PK values
+        if not self.pk_indexes:
+            return False
+        try:
+            pk_values = self.pk_attr_getter(given_attr_values)
+        except KeyError:
+            return False  # PK not fully valued, missing PK attributes would be generated
+        return pk_values in self.pk_index
+
     def get_rel_model(self):
         return self.rel_model
 
@@ -261,12 +468,12 @@ class RelationInstance:
             s += '\n'
         return s
 
+    def iter_ASP(self):
+        # yield one ASP fact (as a line) per tuple, without building the whole representation
+        return asp_fact_lines(self.rel_model.name.lower(), map(itemgetter(0), self.tuples))
+
     def repr_ASP(self):
-        fact_name = self.rel_model.name.lower()
-        s = ""
-        for tup in self.tuples:
-            s += f"{fact_name}({','.join(tup[0]).lower()}).\n"
-        return s
+        return ''.join(self.iter_ASP())
 
     def __str__(self):
         s = f"Instance of {self.rel_model.name}, {self.get_size()} tuples : {self.nbr_generated} (regular)" \
@@ -290,7 +497,14 @@ if __name__ == "__main__":
 
     print(inst)
 #    print(inst.generate_new_tuple(given_attr_values={"pk": '1'}))
-#    print(inst.get_tuples_indexes(10, selector=lambda t: t[0][0] > "1", rdm_selection=True))
+    print(inst.get_tuples_indexes(10, selector=lambda t: t[0][0] > "1", rdm_selection=True))
+    from src.instantiation.predicates import Attr, FROM_CONSTRAINT
+    print(inst.get_tuples_indexes2(10, selector=(Attr("pk") > 1) & ~FROM_CONSTRAINT))
+    print("selector matching less than nbr tuples : picked once each, repeated only beyond the instance size")
+    inst100 = RelationInstance(SRel, attribute_fix=["pk", "attr1"])
+    inst100.feed_tuples([(str(ind), f"val{ind}") for ind in range(100)])
+    print(len(inst100.get_tuples_indexes(20, selector=Attr("pk") < 10)) == 10,
+          len(inst100.get_tuples_indexes(120, selector=Attr("pk") < 10, rdm_selection=True)) == 30)
 
     # print(inst.degenerate_tuples_at_inds([0, 1]))
     inst.degenerate_and_feed_tuples_at_inds([0,1])
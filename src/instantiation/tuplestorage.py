@@ -0,0 +1,256 @@
+from array import array
+from itertools import accumulate
+from zlib import crc32
+
+
+class StrColumn:
+    # compact column of string values : all values utf-8 encoded in one buffer, with end offset of each value
+
+    def __init__(self):
+        self.data = bytearray()
+        self.ends = array('Q')
+
+    def extend(self, values):
+        self.extend_bytes([str(val).encode() for val in values])
+
+    def extend_bytes(self, encoded):
+        start = len(self.data)
+        self.ends.extend(start + end for end in accumulate(map(len, encoded)))
+        self.data += b''.join(encoded)
+
+    def get(self, ind):
+        return self.get_bytes(ind).decode()
+
+    def get_bytes(self, ind):
+        start = self.ends[ind-1] if ind > 0 else 0
+        return self.data[start:self.ends[ind]]
+
+    def iter_values(self, start=0, stop=None):
+        stop = len(self.ends) if stop is None else stop
+        data, ends = self.data, self.ends
+        prev = ends[start-1] if start > 0 else 0
+        for ind in range(start, stop):
+            end = ends[ind]
+            yield data[prev:end].decode()
+            prev = end
+
+    def iter_bytes(self):
+        data, prev = self.data, 0
+        for end in self.ends:
+            yield data[prev:end]
+            prev = end
+
+    def __len__(self):
+        return len(self.ends)
+
+
+class BitVector:
+    # packed sequence of booleans, 8 per byte
+
+    def __init__(self):
+        self.bytes = bytearray()
+        self.size = 0
+
+    def extend(self, bits):
+        bits = tuple(bits)
+        if bits and bits.count(bits[0]) == len(bits):
+            self.extend_constant(bits[0], len(bits))
+        else:
+            for bit in bits:
+                self.append(bit)
+
+    def extend_constant(self, bit, nbr):
+        # fill the last partial byte bit by bit, then whole bytes at once
+        while nbr > 0 and self.size % 8:
+            self.append(bit)
+            nbr -= 1
+        whole_bytes, remaining = divmod(nbr, 8)
+        self.bytes.extend((b'\xff' if bit else b'\x00') * whole_bytes)
+        self.size += whole_bytes * 8
+        for _ in range(remaining):
+            self.append(bit)
+
+    def append(self, bit):
+        if self.size % 8 == 0:
+            self.bytes.append(0)
+        if bit:
+            self.bytes[-1] |= 1 << (self.size % 8)
+        self.size += 1
+
+    def get(self, ind):
+        return bool(self.bytes[ind >> 3] >> (ind & 7) & 1)
+
+    def iter_bits(self, start=0, stop=None):
+        stop = self.size if stop is None else stop
+        bytes_ = self.bytes
+        for ind in range(start, stop):
+            yield bool(bytes_[ind >> 3] >> (ind & 7) & 1)
+
+    def __len__(self):
+        return self.size
+
+
+class PKIndex:
+    # compact set of PK values (a value or a tuple of values, as RelationInstance.pk_getter gives), for instances
+    # of many tuples : keys are packed in a StrColumn and found by open addressing in an array of their positions,
+    # hashed by crc32 (the same in all processes). About 30 bytes per key, instead of a set of tuples of strings.
+    INITIAL_SLOTS = 1 << 10
+
+    def __init__(self):
+        self.keys = StrColumn()
+        self.slots = array('q', [-1]) * self.INITIAL_SLOTS  # position of key in keys, -1 for an empty slot
+
+    @staticmethod
+    def pack(key):
+        # tuple of values of a composite PK by its repr, unambiguous whatever its values
+        return key.encode() if isinstance(key, str) else repr(key).encode()
+
+    def find_slot(self, packed):
+        # slot of packed key, or empty slot where to put it
+        slots, data, ends = self.slots, self.keys.data, self.keys.ends
+        mask = len(slots) - 1
+        slot = crc32(packed) & mask
+        ind = slots[slot]
+        while ind >= 0 and data[ends[ind-1] if ind else 0:ends[ind]] != packed:
+            slot = (slot + 1) & mask
+            ind = slots[slot]
+        return slot
+
+    def add(self, key):
+        self.update([key])
+
+    def update(self, keys):
+        # keys not already present are packed in keys column at once, then placed in slots (all distinct)
+        slots = self.slots
+        new_keys = [packed for packed in dict.fromkeys(map(self.pack, keys)) if slots[self.find_slot(packed)] < 0]
+        if not new_keys:
+            return
+        start = len(self.keys)
+        self.keys.extend_bytes(new_keys)
+        if 2 * len(self.keys) > len(slots):  # load factor kept under 1/2
+            nbr_slots = len(slots)
+            while 2 * len(self.keys) > nbr_slots:
+                nbr_slots *= 2
+            self.slots = array('q', [-1]) * nbr_slots
+            self.place(self.keys.iter_bytes(), 0)
+        else:
+            self.place(new_keys, start)
+
+    def place(self, packed_keys, start):
+        # put distinct packed keys, not in slots yet, whose positions in keys column start at start
+        slots = self.slots
+        mask = len(slots) - 1
+        for ind, packed in enumerate(packed_keys, start):
+            slot = crc32(packed) & mask
+            while slots[slot] >= 0:
+                slot = (slot + 1) & mask
+            slots[slot] = ind
+
+    def __contains__(self, key):
+        return self.slots[self.find_slot(self.pack(key))] >= 0
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class ColumnarTuples:
+    # sequence of (tuple_of_values, from_constraint, degenerated) triples, as the list RelationInstance.tuples,
+    # but stored as one StrColumn per fixed attribute and 2 BitVectors for flags
+
+    def __init__(self, nbr_columns):
+        self.columns = [StrColumn() for _ in range(nbr_columns)]
+        self.from_constraint = BitVector()
+        self.degenerated = BitVector()
+        self.size = 0
+
+    def extend(self, triples):
+        triples = list(triples)
+        if not triples:
+            return
+        tuples_values, from_constraint, degenerated = zip(*triples)
+        for column, column_values in zip(self.columns, zip(*tuples_values)):
+            column.extend(column_values)
+        self.from_constraint.extend(from_constraint)
+        self.degenerated.extend(degenerated)
+        self.size += len(triples)
+
+    def append(self, triple):
+        self.extend([triple])
+
+    def get_column(self, ind_column, start=0, stop=None):
+        return list(self.columns[ind_column].iter_values(start, stop))
+
+    def get_flags(self, flag_name, start=0, stop=None):
+        # flag_name as "from_constraint" or "degenerated"
+        return list(getattr(self, flag_name).iter_bits(start, stop))
+
+    def get_tuple(self, ind):
+        values = tuple(column.get(ind) for column in self.columns)
+        return values, self.from_constraint.get(ind), self.degenerated.get(ind)
+
+    def iter_triples(self, start=0, stop=None):
+        stop = self.size if stop is None else stop
+        values = zip(*(column.iter_values(start, stop) for column in self.columns))
+        return zip(values, self.from_constraint.iter_bits(start, stop), self.degenerated.iter_bits(start, stop))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(self.size)
+            if step == 1:
+                return list(self.iter_triples(start, max(start, stop)))
+            return [self.get_tuple(ind) for ind in range(start, stop, step)]
+        if item < 0:
+            item += self.size
+        if not 0 <= item < self.size:
+            raise IndexError("ColumnarTuples index out of range")
+        return self.get_tuple(item)
+
+    def __iter__(self):
+        return self.iter_triples()
+
+    def __len__(self):
+        return self.size
+
+
+class StreamedTuples:
+    # stands for the tuples of a relation instance that are not kept : (tuple_of_values, from_constraint, degenerated)
+    # triples added are written to sink (as sink.write_tuples(rel_inst, triples)) then forgotten, only counted
+
+    def __init__(self, sink, rel_inst):
+        self.sink = sink
+        self.rel_inst = rel_inst
+        self.size = 0
+
+    def extend(self, triples):
+        triples = list(triples)
+        if triples:
+            self.sink.write_tuples(self.rel_inst, triples)
+            self.size += len(triples)
+
+    def append(self, triple):
+        self.extend([triple])
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return []  # none kept
+        raise TypeError(f"Tuples of streamed instance of {self.rel_inst.name} are not kept, cannot access tuple {item}")
+
+    def __iter__(self):
+        return iter(())
+
+    def __len__(self):
+        return self.size
+
+
+if __name__ == "__main__":
+    tuples = ColumnarTuples(2)
+    tuples.extend([(('1', "valueeeee"), False, False), (('2', "élève"), False, False)])
+    tuples.extend([(('3', "from_constraint"), True, False)])
+    tuples.append((('4', "degenerated"), False, True))
+    print(len(tuples), tuples[0], tuples[-1], tuples[1:3], list(tuples), sep='\n')
+    print("column 1 :", tuples.get_column(1))
+    pk_index = PKIndex()
+    pk_index.update([('1', "a"), ('2', "b"), ('1', "a")])
+    pk_index.update(str(ind) for ind in range(3000))
+    print("PK index :", len(pk_index), ('1', "a") in pk_index, ('1', "b") in pk_index, "2999" in pk_index,
+          "3000" in pk_index, len(pk_index.slots))
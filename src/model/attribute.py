@@ -1,6 +1,7 @@
 import src.model.generators as generators
 import enum
 import copy
+import inspect
 
 
 class AttributeTypes(enum.Enum):
@@ -13,52 +14,126 @@ class AttributeTypes(enum.Enum):
     boolean = "BOOLEAN"
 
 
-def dflt_gen_for_type(attr_type):
-    if attr_type == AttributeTypes.int:
-        return generators.generator_rdm_int()
-    if attr_type == AttributeTypes.incr_int:
-        return generators.generator_increment_int()
-    if attr_type == AttributeTypes.str:
-        return generators.generator_rdm_str()
-    if attr_type == AttributeTypes.incr_str:
-        return generators.generator_increment_str()
-    if attr_type == AttributeTypes.word_str:
-        return generators.generator_word()
-    if attr_type == AttributeTypes.boolean:
-        return generators.generator_rdm_bool()
+# name of the registered generator class (see generators.GENERATOR_CLASSES) giving values of each type by default
+DFLT_GENERATORS = {AttributeTypes.int: "rdm_int", AttributeTypes.incr_int: "increment_int",
+                   AttributeTypes.str: "rdm_str", AttributeTypes.incr_str: "increment_str",
+                   AttributeTypes.word_str: "word", AttributeTypes.boolean: "rdm_bool", AttributeTypes.date: "rdm_date"}
+
+
+def dflt_gen_for_type(attr_type, rng=None, unique=False):
+    return generators.GENERATOR_CLASSES[DFLT_GENERATORS[attr_type]](rng=rng, unique=unique)
+
+
+def accepts_keyword(get_generator_fun, keyword):
+    # whether get_generator_fun(attr_type, keyword=..) can be called (eg. with rng or unique keywords)
+    try:
+        params = inspect.signature(get_generator_fun).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(param.name == keyword or param.kind == param.VAR_KEYWORD for param in params)
 
 
 class AttributeInfo:
 
-    def __init__(self, name, attr_type=AttributeTypes.int, get_generator_fun=dflt_gen_for_type, gen_order=1, desc=""):
+    def __init__(self, name, attr_type=AttributeTypes.int, get_generator_fun=dflt_gen_for_type, gen_order=1, desc="",
+                 rng=None, unique=False):
         # get_generator_fun(attr_type) should return either a fun such as fun(o_attr_values) returns a value
         # either a fun such as fun() returns an iterator generator supporting next(generator)
+        # if it accepts a rng keyword argument, it is given a RandomStream to draw from when rng is set,
+        # if it accepts a unique keyword argument, it is asked for distinct values when unique is set (eg. PK)
+        # generators.Generator objects declare whether values need others attributes values, and can be created by
+        # a generators.GeneratorFactory (picklable, so that attributes can be sent to other processes)
         self.name = name
         self.attr_type = AttributeTypes[attr_type] if isinstance(attr_type, str) else attr_type
         self.get_generator_fun = get_generator_fun  # useful to reset getting a fresh new python generator type object
-        self.generator = get_generator_fun(self.attr_type)
+        self.rng = rng  # RandomStream the generator draws from, None to draw from global random module
+        self.unique = unique
+        self.reset_generator()
         self.order = max(gen_order, 0)
         self.desc = desc
 
     # ---- GENERATOR INTERACTIONS ----
 
+    def get_new_generator(self):
+        kwargs = {}
+        if self.rng is not None and accepts_keyword(self.get_generator_fun, "rng"):
+            # fresh copy of the stream so that a new generator restarts from its first value
+            kwargs["rng"] = copy.copy(self.rng)
+        if self.unique and accepts_keyword(self.get_generator_fun, "unique"):
+            kwargs["unique"] = True
+        return self.get_generator_fun(self.attr_type, **kwargs)
+
     def reset_generator(self):
-        self.generator = self.get_generator_fun(self.attr_type)
+        self.generator = self.get_new_generator()
+        # iterators (as python generators) give values by next(), others are called with others attributes values
+        self.is_iterator = not isinstance(self.generator, generators.Generator) and hasattr(self.generator, "__next__")
+        self.nbr_drawn = 0  # nbr of values generated since the generator was got
+
+    def set_rng(self, rng):
+        # draw from the random stream rng from now, restarting the generator
+        self.rng = rng
+        self.reset_generator()
+
+    def set_unique(self, unique=True):
+        # ask generator for distinct values from now (if supported), restarting it
+        self.unique = unique
+        self.reset_generator()
+
+    def skip_values(self, nbr):
+        # advance the generator as if nbr values were generated (eg. generated by a copy in another process)
+        if nbr > 0:
+            generators.advance_generator(self.generator, nbr)
+            self.nbr_drawn += nbr
 
     def get_generated_value(self, other_attr_values=None):
         other_attr_values = {} if other_attr_values is None else other_attr_values
         if other_attr_values.get(self.name) is not None:  # already generated value in ones given
             return str(other_attr_values[self.name])
-        try:
-            return str(next(self.generator))  # In case generator is actually a generator/iterable
-        except TypeError:
-            return str(self.generator(other_attr_values))
+        self.nbr_drawn += 1
+        if self.is_iterator:
+            return str(next(self.generator))
+        return str(self.generator(other_attr_values))
+
+    def get_generated_values(self, n, context_columns=None):
+        # generate n values at once, context_columns as {attr_name: [val_row1, val_row2,..]} with columns of size n
+        # giving for each row the others attributes values already known (None if unknown)
+        context_columns = {} if context_columns is None else context_columns
+        if context_columns.get(self.name) is not None:  # already generated values in ones given
+            return [str(val) for val in context_columns[self.name]]
+        self.nbr_drawn += n
+        if self.needs_columns():
+            return [str(val) for val in self.generator.batch_columns(context_columns, n)]
+        if not self.needs_context():
+            return generators.batch_generated_values(self.generator, n)
+        # value depends on others attributes values, rebuild them row by row
+        values = []
+        for row in range(n):
+            other_attr_values = {}
+            for attr_name, column in context_columns.items():
+                if column[row] is not None:
+                    other_attr_values[attr_name] = column[row]
+            values.append(str(self.generator(other_attr_values)))
+        return values
+
+    def needs_columns(self):
+        # whether values are computed column-wise from others attributes columns (see generators.ColumnGenerator)
+        return isinstance(self.generator, generators.Generator) and self.generator.kind == generators.COLUMNAR
+
+    def needs_context(self):
+        # a fun generator without batch capability may compute its value from others attributes values
+        if isinstance(self.generator, generators.Generator):
+            return self.generator.kind == generators.CONTEXTUAL
+        return not(hasattr(self.generator, "__next__") or hasattr(self.generator, "batch"))
 
     # ---- GETTERS ----
 
     def get_gen_order(self):
         return self.order
 
+    def get_domain_size(self):
+        # nbr of distinct values the generator can give, None if unknown or unbounded
+        return getattr(self.generator, "domain_size", None)
+
     def get_attr_type_value(self):
         return self.attr_type.value
 
@@ -72,7 +147,8 @@ class AttributeInfo:
         return self.order >= other.get_gen_order()
 
     def __copy__(self):
-        return AttributeInfo(self.name, self.attr_type, self.get_generator_fun, self.order, self.desc)
+        return AttributeInfo(self.name, self.attr_type, self.get_generator_fun, self.order, self.desc,
+                             copy.copy(self.rng), self.unique)
 
     def __str__(self):
         s = f"{self.name} [{self.order}] ({self.attr_type.value})"
@@ -101,4 +177,13 @@ if __name__ == "__main__":
     print("Copying attr2, generating 5 values from copy should not impact attr2 generation")
     print(" +-> 5 values from attr2 copy :", [attr_copy.get_generated_value() for _ in range(5)])
     print(" +-> next val for attr2 :", attr2.get_generated_value())
+    print("Generating 5 values at once for each..")
+    for attr in [attr1, attr2, attr3, attr4]:
+        print(f"{attr.name} :", ', '.join(attr.get_generated_values(5)))
+    from src.model.randomness import RandomStream
+    attr1.set_rng(RandomStream(42))
+    print("Seeding attr1, 5 values :", attr1.get_generated_values(5))
+    attr1.reset_generator()
+    attr1.skip_values(2)
+    print(" +-> reset and skipping 2 values, 3 next ones :", [attr1.get_generated_value() for _ in range(3)])
 
@@ -1,94 +1,648 @@
+import datetime
 import random
 import string
+import os
+import re
+import mmap
+import math
+from array import array
+from itertools import islice
+from collections import deque
+from abc import ABC, abstractmethod
+from src.model.randomness import derived_draws, KeyedPermutation
 
 
-def generator_rdm_int(min_val=0, max_val=100000):
-    return lambda _: str(random.randint(min_val, max_val))
+# A generator is either a fun such as fun(o_attr_values) returns a value, either an iterator supporting next().
+# A fun generator may also expose fun.batch(n) returning n values at once (as strings), so that a whole column
+# can be generated in one call, and fun.advance(n) to skip n values. Iterators are batched/advanced slicing them.
+# Random generators draw from the global random module, or from a RandomStream rng if given (reproducible).
+# Generators of this module are Generator objects, fun generators declaring what their values depend on.
+
+STATELESS = "stateless"  # values depend neither on previous ones nor on others attributes (nothing to reset)
+SEQUENTIAL = "sequential"  # value depends on its rank (state to reset, save or advance)
+CONTEXTUAL = "contextual"  # value computed from others attributes values (o_attr_values)
+COLUMNAR = "columnar"  # column of values computed at once from columns of others attributes values
+
+GENERATOR_CLASSES = {}  # {name: Generator class}, registered to be created by name (see GeneratorFactory)
+
+
+def register_generator(name):
+    # class decorator registering a Generator class, whose __init__ accepts rng and unique keyword arguments
+    def register(generator_class):
+        GENERATOR_CLASSES[name] = generator_class
+        return generator_class
+    return register
+
+
+class GeneratorFactory:
+    # get_generator_fun creating generators of a registered class with params, picklable unlike lambdas
+    # (eg. GeneratorFactory("rdm_int", min_val=1, max_val=6)), so that attributes can be sent to other processes
+
+    def __init__(self, name, **params):
+        if name not in GENERATOR_CLASSES:
+            raise ValueError(f"Unknown generator {name}, not in {list(GENERATOR_CLASSES)}")
+        self.name = name
+        self.params = params
+
+    def __call__(self, attr_type=None, rng=None, unique=False):
+        return GENERATOR_CLASSES[self.name](rng=rng, unique=unique, **self.params)
+
+    def __repr__(self):
+        return f"GeneratorFactory({self.name!r}, {', '.join(f'{key}={val!r}' for key, val in self.params.items())})"
+
+
+class Generator(ABC):
+    # Fun generator object : generator(o_attr_values) gives the next value, as a string. kind (STATELESS, SEQUENTIAL,
+    # CONTEXTUAL or COLUMNAR) lets the engine know whether values can be batched or need others attributes values.
+    # State is got by getstate(), restored by setstate(), and only made of picklable values.
+    kind = STATELESS
+    domain_size = None  # nbr of distinct values that can be generated, None if unknown or unbounded
+
+    @abstractmethod
+    def __call__(self, o_attr_values=None):
+        pass
+
+    def batch(self, n):
+        return [self(None) for _ in range(n)]
+
+    def advance(self, n):
+        pass
+
+    def getstate(self):
+        return None
+
+    def setstate(self, state):
+        pass
+
+    def reset(self):
+        # back to the first value
+        pass
+
+
+class SequentialGenerator(Generator):
+    # generator whose values depend on their rank, also usable as an iterator
+    kind = SEQUENTIAL
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self(None)
+
+
+class ContextualGenerator(Generator):
+    # generator computing values from others attributes values, subclasses define __call__(o_attr_values)
+    kind = CONTEXTUAL
+
+
+class ColumnGenerator(Generator):
+    # generator computing a whole column of values from columns of others attributes values, by
+    # batch_columns(columns, n) with columns as {attr_name: [val_row1, .., val_row_n]} (None where unknown), instead
+    # of a call per row. Columns are the ones of attributes generated before its gen_order level (see GenerationPlan).
+    # Either subclassed defining batch_columns, either created from a fun(columns, n) returning the column.
+    kind = COLUMNAR
+
+    def __init__(self, fun=None):
+        self.fun = fun
+
+    def batch_columns(self, columns, n):
+        return self.fun(columns, n)
+
+    def __call__(self, o_attr_values=None):
+        # single row, others attributes values as columns of one value
+        o_attr_values = {} if o_attr_values is None else o_attr_values
+        return self.batch_columns({attr_name: [val] for attr_name, val in o_attr_values.items()}, 1)[0]
+
+
+def get_column(columns, attr_name, n, missing_val=None):
+    # column of attr_name values among columns, missing_val replacing unknown ones
+    column = columns.get(attr_name)
+    if column is None:
+        return [missing_val] * n
+    if None in column:
+        return [missing_val if val is None else val for val in column]
+    return column
+
+
+@register_generator("concat")
+class Concat(ColumnGenerator):
+    # composite value joining values of attributes attr_names with sep (eg. "12-abc" from attr1 and attr2), unknown
+    # values replaced by missing_val. Values are not drawn, so rng and unique are ignored.
+
+    def __init__(self, attr_names, sep='-', missing_val="UNK", rng=None, unique=False):
+        super().__init__()
+        self.attr_names = tuple(attr_names)
+        self.sep = sep
+        self.missing_val = missing_val
+
+    def batch_columns(self, columns, n):
+        return list(map(self.sep.join, zip(*(get_column(columns, attr_name, n, self.missing_val)
+                                             for attr_name in self.attr_names))))
+
+
+def batch_generated_values(generator, n):
+    batch = getattr(generator, "batch", None)
+    if batch is not None:
+        return batch(n)
+    return list(map(str, islice(generator, n)))
+
+
+def advance_generator(generator, n):
+    # skip n values of a generator, fun generators without advance() have no state to advance
+    advance = getattr(generator, "advance", None)
+    if advance is not None:
+        advance(n)
+    elif hasattr(generator, "__next__"):
+        deque(islice(generator, n), maxlen=0)
+
+
+class IndexedGenerator(Generator):
+    # Generator of values among domain_size ones, computed by value_from_ind() from their index, or by
+    # value_from_draw() from a 64 bits draw. Values are drawn from rng if given, else from random module. If unique,
+    # distinct values are given while less than domain_size were generated : value of rank i is the one of the i-th
+    # index of a keyed permutation of range(domain_size) (keyed from rng if given), cycling once all generated.
+
+    def __init__(self, domain_size, rng=None, unique=False):
+        self.domain_size = domain_size
+        self.rng = rng
+        self.unique = unique
+        self.kind = SEQUENTIAL if unique or rng is not None else STATELESS
+        self.permutation = KeyedPermutation(domain_size, rng.key if rng is not None else random.getrandbits(64)) \
+            if unique else None
+        self.rank = 0
+        self.initial_state = self.getstate()
+
+    @abstractmethod
+    def value_from_ind(self, ind):
+        pass
+
+    def value_from_draw(self, draw):
+        # value from a draw uniform in [0, 2^64), by default the one of its index in domain
+        return self.value_from_ind(draw * self.domain_size >> 64)
+
+    def random_value(self):
+        return self.value_from_ind(random.randrange(self.domain_size))
+
+    def random_batch(self, n):
+        return [self.random_value() for _ in range(n)]
+
+    def __call__(self, o_attr_values=None):
+        if self.unique:
+            self.rank += 1
+            return self.value_from_ind(self.permutation[(self.rank - 1) % self.domain_size])
+        if self.rng is not None:
+            self.rng.next_value()
+            return self.value_from_draw(self.rng.next64())
+        return self.random_value()
+
+    def batch(self, n):
+        if self.unique:
+            ranks = range(self.rank, self.rank + n)
+            self.rank += n
+            return [self.value_from_ind(self.permutation[rank % self.domain_size]) for rank in ranks]
+        if self.rng is not None:
+            return list(map(self.value_from_draw, self.rng.values64(n)))
+        return self.random_batch(n)
+
+    def advance(self, n):
+        if self.unique:
+            self.rank += n
+        elif self.rng is not None:
+            self.rng.jump(n)
+
+    def getstate(self):
+        return self.rank, (None if self.rng is None else self.rng.getstate())
+
+    def setstate(self, state):
+        self.rank, rng_state = state
+        if rng_state is not None:
+            self.rng.setstate(rng_state)
+
+    def reset(self):
+        self.setstate(self.initial_state)
+
+
+@register_generator("rdm_int")
+class RdmInt(IndexedGenerator):
+
+    def __init__(self, min_val=0, max_val=100000, rng=None, unique=False):
+        self.min_val = min_val
+        self.max_val = max_val
+        super().__init__(max_val - min_val + 1, rng, unique)
+
+    def value_from_ind(self, ind):
+        return str(self.min_val + ind)
+
+    def value_from_draw(self, draw):
+        return str(self.min_val + (draw * self.domain_size >> 64))
+
+    def random_value(self):
+        return str(random.randint(self.min_val, self.max_val))
+
+    def random_batch(self, n):
+        return list(map(str, random.choices(range(self.min_val, self.max_val + 1), k=n)))
+
+
+def generator_rdm_int(min_val=0, max_val=100000, rng=None, unique=False):
+    # unique to draw values without replacement (as long as the max_val-min_val+1 values are not all drawn)
+    return RdmInt(min_val, max_val, rng, unique)
 
 
 def get_generator_rdm_int(min_val=0, max_val=100000):
-    return lambda _: generator_rdm_int(min_val=min_val, max_val=max_val)
+    return GeneratorFactory("rdm_int", min_val=min_val, max_val=max_val)
+
+
+@register_generator("rdm_str")
+class RdmStr(IndexedGenerator):
+    chars = string.ascii_uppercase + string.digits
+
+    def __init__(self, str_length=8, rng=None, unique=False):
+        self.str_length = str_length
+        super().__init__(len(self.chars) ** str_length, rng, unique)
+
+    def value_from_ind(self, ind):
+        return chars_from_index(ind, self.chars, self.str_length)
+
+    def value_from_draw(self, draw):
+        return chars_from_draw(draw, self.chars, self.str_length)
+
+    def random_value(self):
+        return ''.join(random.choices(self.chars, k=self.str_length))
+
+    def random_batch(self, n):
+        # draw all characters at once then cut the resulting string in n pieces
+        str_length = self.str_length
+        drawn = ''.join(random.choices(self.chars, k=n*str_length))
+        return [drawn[i:i+str_length] for i in range(0, n*str_length, str_length)]
+
+
+def generator_rdm_str(str_length=8, rng=None, unique=False):
+    return RdmStr(str_length, rng, unique)
+
 
+def chars_from_index(ind, chars, str_length):
+    # ind written in base len(chars) with str_length digits
+    picked = []
+    for _ in range(str_length):
+        ind, digit = divmod(ind, len(chars))
+        picked.append(chars[digit])
+    return ''.join(picked)
 
-def generator_rdm_str(str_length=8):
-    return lambda _: ''.join(random.choices(string.ascii_uppercase + string.digits, k=str_length))
+
+def chars_from_draw(draw, chars, str_length):
+    # string of str_length chars picked from the digits of draw (and of draws derived from it) in base len(chars)
+    nbr = len(chars)
+    per_draw = max(1, int(64 / math.log2(nbr)) - 1) if nbr > 1 else str_length
+    picked = []
+    for sub_draw in derived_draws(draw, -(-str_length // per_draw)):
+        for _ in range(min(per_draw, str_length - len(picked))):
+            sub_draw, digit = divmod(sub_draw, nbr)
+            picked.append(chars[digit])
+    return ''.join(picked)
 
 
 def get_generator_rdm_str(str_length=8):
-    return lambda _: generator_rdm_str(str_length=str_length)
+    return GeneratorFactory("rdm_str", str_length=str_length)
+
+
+@register_generator("increment_int")
+class IncrementInt(SequentialGenerator):
+    # start_val, start_val + incr_val, .. (always distinct, rng and unique are ignored)
+
+    def __init__(self, incr_val=1, start_val=1, rng=None, unique=False):
+        self.incr_val = incr_val
+        self.start_val = start_val
+        self.rank = 0
+
+    def nth(self, rank):
+        return str(self.start_val + rank * self.incr_val)
+
+    def __call__(self, o_attr_values=None):
+        self.rank += 1
+        return str(self.start_val + (self.rank - 1) * self.incr_val)
+
+    def batch(self, n):
+        start = self.start_val + self.rank * self.incr_val
+        self.rank += n
+        return list(map(str, range(start, start + n * self.incr_val, self.incr_val))) if self.incr_val else \
+            [str(start)] * n
+
+    def advance(self, n):
+        self.rank += n
+
+    def getstate(self):
+        return self.rank
+
+    def setstate(self, state):
+        self.rank = state
+
+    def reset(self):
+        self.rank = 0
 
 
 def generator_increment_int(incr_val=1, start_val=1):
-    i = start_val - 1
-    while True:
-        i += incr_val
-        yield i
+    return IncrementInt(incr_val=incr_val, start_val=start_val)
 
 
 def get_generator_increment_int(incr_val=1, start_val=1):
-    return lambda _: generator_increment_int(incr_val=incr_val, start_val=start_val)
+    return GeneratorFactory("increment_int", incr_val=incr_val, start_val=start_val)
+
+
+@register_generator("increment_str")
+class IncrementStr(SequentialGenerator):
+    # Incremented strings : the letter at the rightmost rank is incremented (by incr_val letters) until it
+    # overflows, then the one at the previous rank and so on (overflowed ranks keeping the remainder), and once the
+    # first rank overflowed a start letter is prepended, as "aaaaa", "aaaab", .., "aaaaz", "aaaba", ..
+    # Values are computed from their index : ranks of a same length block start from letters depending only on
+    # the block, and each rank gives a known nbr of values, so that nth(k) and advance(k) don't replay the
+    # previous values, and the values of a rank are batched as slices of letters between fixed prefix and suffix.
+
+    def __init__(self, incr_val=1, start_length=5, letters=string.ascii_lowercase, rng=None, unique=False):
+        self.incr_val = incr_val
+        self.start_length = start_length
+        self.letters = letters
+        self.size = len(letters)
+        # letter indexes of block j are [g_0, .., g_j-1] + [g_j] * start_length, g_0 = 0 and g_i+1 = overflowed(g_i)
+        self.block_letters = [0]
+        self.position = 0  # index of the next value
+        self.values = self.iter_values(0)
+
+    def get_nbr_incremented(self, ind_letter):
+        # nbr of values given by a rank starting with letter ind_letter, before it overflows
+        return (self.size - 1 - ind_letter) // self.incr_val
+
+    def get_overflowed(self, ind_letter):
+        return (ind_letter + (self.get_nbr_incremented(ind_letter) + 1) * self.incr_val) % self.size
+
+    def get_block_letter(self, ind):
+        while len(self.block_letters) <= ind:
+            self.block_letters.append(self.get_overflowed(self.block_letters[-1]))
+        return self.block_letters[ind]
+
+    def locate(self, position):
+        # (block, index of value in block) of value at position, index 0 being the value starting the block
+        block, block_start, previous_sum = 0, 0, 0  # previous_sum of values given by ranks of g_0 .. g_block-1
+        while True:
+            block_letter = self.get_block_letter(block)
+            nbr_values = 1 + self.start_length * self.get_nbr_incremented(block_letter) + previous_sum
+            if position < block_start + nbr_values:
+                return block, position - block_start
+            block_start += nbr_values
+            previous_sum += self.get_nbr_incremented(block_letter)
+            block += 1
+
+    def iter_values(self, position):
+        letters, incr_val = self.letters, self.incr_val
+        block, ind_in_block = self.locate(position)
+        while True:
+            inds = [self.get_block_letter(ind) for ind in range(block)] + [self.get_block_letter(block)] * \
+                self.start_length
+            overflowed = [self.get_block_letter(ind + 1) for ind in range(block)] + \
+                [self.get_block_letter(block + 1)] * self.start_length
+            if ind_in_block == 0:
+                yield ''.join(letters[ind] for ind in inds)
+            skip = max(ind_in_block - 1, 0)
+            for rank in range(len(inds) - 1, -1, -1):
+                nbr = self.get_nbr_incremented(inds[rank])
+                if skip >= nbr:
+                    skip -= nbr
+                    continue
+                prefix = ''.join(letters[ind] for ind in inds[:rank])
+                suffix = ''.join(letters[ind] for ind in overflowed[rank + 1:])
+                first = inds[rank] + (skip + 1) * incr_val
+                for letter in letters[first:inds[rank] + nbr * incr_val + 1:incr_val]:
+                    yield prefix + letter + suffix
+                skip = 0
+            block, ind_in_block = block + 1, 0
+
+    def nth(self, position):
+        return next(self.iter_values(position))
+
+    def advance(self, n):
+        self.position += n
+        self.values = self.iter_values(self.position)
+
+    def batch(self, n):
+        self.position += n
+        return list(islice(self.values, n))
+
+    def __call__(self, o_attr_values=None):
+        self.position += 1
+        return next(self.values)
+
+    def getstate(self):
+        return self.position
+
+    def setstate(self, state):
+        self.position = state
+        self.values = self.iter_values(state)
+
+    def reset(self):
+        self.setstate(0)
+
+    def __getstate__(self):
+        # values being iterated are not picklable, iterated again from position once unpickled
+        state = self.__dict__.copy()
+        del state["values"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.values = self.iter_values(self.position)
 
 
 def generator_increment_str(incr_val=1, start_length=5, letters=string.ascii_lowercase):
-    start_letter = letters[0]
-    size = len(letters)
-    i = [start_letter]*start_length  # list to mute it on the fly
-    yield ''.join(i)
-    while True:
-        rank = len(i)-1
-        while rank > -1:
-            ind_letter_at_rank = letters.index(i[rank])
-            ind_new = ind_letter_at_rank + incr_val
-            if ind_new >= size:
-                # need to report increment on next rank
-                i[rank] = letters[ind_new % size]
-                rank -= 1
-            else:
-                # increment letter at current rank
-                i[rank] = letters[ind_new]
-                yield ''.join(i)
-        # need to extend the string
-        i = [start_letter] + i
-        yield ''.join(i)
+    return IncrementStr(incr_val=incr_val, start_length=start_length, letters=letters)
 
 
 def get_generator_increment_str(incr_val=1, start_length=5, letters=string.ascii_lowercase):
-    return lambda _: generator_increment_str(incr_val=incr_val, start_length=start_length, letters=letters)
+    return GeneratorFactory("increment_str", incr_val=incr_val, start_length=start_length, letters=letters)
 
 
-def generator_word(dict_path="/etc/dictionaries-common/words", min_len=4, rdm=False):
-    with open(dict_path, 'r') as fp:
-        words = fp.readlines()
-    nbr = len(words)
-    i = 0
-    if rdm:
-        random.shuffle(words)
-    if len(words) > 0:
-        while True:
-            word = words[i].strip()
-            if len(word) >= min_len:
-                yield word
-            i = (i + 1) % nbr
-    while True:
-        yield "word"
+class WordList:
+    # words of a dictionary file (one per line) having at least min_len characters. The file is memory-mapped and
+    # only the offsets of kept words are indexed, words are decoded when accessed.
+
+    def __init__(self, dict_path, min_len=4):
+        self.dict_path = dict_path
+        self.min_len = min_len
+        self.starts, self.ends = array('Q'), array('Q')
+        with open(dict_path, 'rb') as fp:
+            empty = os.fstat(fp.fileno()).st_size == 0
+            self.data = b'' if empty else mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        for match in re.finditer(rb'[^\r\n]+', self.data):
+            word = match.group().strip()
+            # a word has at most as many characters as bytes, decoding is only needed for long enough ones
+            if len(word) >= min_len and len(word.decode(errors="replace")) >= min_len:
+                start = match.start() + match.group().index(word)
+                self.starts.append(start)
+                self.ends.append(start + len(word))
+
+    def __getitem__(self, ind):
+        return self.data[self.starts[ind]:self.ends[ind]].decode(errors="replace")
+
+    def __len__(self):
+        return len(self.starts)
+
+
+_WORD_LISTS = {}  # process-wide cache {(dict_path, min_len): WordList}, inherited by forked processes
+
+
+def get_word_list(dict_path="/etc/dictionaries-common/words", min_len=4):
+    key = (os.path.realpath(dict_path), min_len)
+    if key not in _WORD_LISTS:
+        _WORD_LISTS[key] = WordList(dict_path, min_len)
+    return _WORD_LISTS[key]
+
+
+@register_generator("word")
+class Word(SequentialGenerator):
+    # words of a dictionary file, in order or in a random order (a permutation of the shared word list : random start
+    # and step coprime with the nbr of words), "word" if there is none. The list is only read at the first value.
+
+    def __init__(self, dict_path="/etc/dictionaries-common/words", min_len=4, rdm=False, rng=None, unique=False):
+        self.dict_path = dict_path
+        self.min_len = min_len
+        self.rdm = rdm
+        self.rng = rng
+        self.words = None
+        self.ind, self.step = 0, 1
+        self.rank = 0
+
+    def start(self):
+        self.words = get_word_list(self.dict_path, self.min_len)
+        nbr = len(self.words)
+        self.domain_size = nbr or 1
+        if self.rdm and nbr > 0:
+            rng = random if self.rng is None else self.rng
+            if rng is not random:
+                rng.next_value()
+            self.ind = rng.randrange(nbr)
+            self.step = rng.randrange(1, nbr) if nbr > 1 else 1
+            while math.gcd(self.step, nbr) != 1:
+                self.step -= 1
+
+    def __call__(self, o_attr_values=None):
+        if self.words is None:
+            self.start()
+        self.rank += 1
+        if not self.words:
+            return "word"
+        return self.words[(self.ind + (self.rank - 1) * self.step) % len(self.words)]
+
+    def advance(self, n):
+        self.rank += n
+
+    def getstate(self):
+        return self.rank
+
+    def setstate(self, state):
+        self.rank = state
+
+    def reset(self):
+        self.rank = 0
+
+    def __getstate__(self):
+        # the memory-mapped word list is got again from its file once unpickled
+        state = self.__dict__.copy()
+        state["words"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if state.get("domain_size") is not None:
+            self.words = get_word_list(self.dict_path, self.min_len)
+
+
+def generator_word(dict_path="/etc/dictionaries-common/words", min_len=4, rdm=False, rng=None):
+    return Word(dict_path=dict_path, min_len=min_len, rdm=rdm, rng=rng)
 
 
 def get_generator_word(dict_path="/etc/dictionaries/common/words", min_len=4, rdm=False):
-    return lambda _: generator_word(dict_path=dict_path, min_len=min_len, rdm=rdm)
+    return GeneratorFactory("word", dict_path=dict_path, min_len=min_len, rdm=rdm)
+
 
+@register_generator("rdm_bool")
+class RdmBool(IndexedGenerator):
 
-def generator_rdm_bool(numeric=True):
-    if numeric:
-        return lambda _: str(random.randint(0, 1))
-    return lambda _: str(random.getrandbits(1))
+    def __init__(self, numeric=True, rng=None, unique=False):
+        self.numeric = numeric
+        super().__init__(2, rng, unique)
+
+    def value_from_ind(self, ind):
+        return str(ind)
+
+    def value_from_draw(self, draw):
+        return str(draw >> 63)
+
+    def random_value(self):
+        return str(random.randint(0, 1) if self.numeric else random.getrandbits(1))
+
+    def random_batch(self, n):
+        # one bit drawn per value, formatted as a string of n '0'/'1' characters
+        return list(format(random.getrandbits(n), f"0{n}b")) if n > 0 else []
+
+
+def generator_rdm_bool(numeric=True, rng=None, unique=False):
+    return RdmBool(numeric, rng, unique)
 
 
 def get_generator_rdm_bool(numeric=True):
-    return lambda _: generator_rdm_bool(numeric=numeric)
+    return GeneratorFactory("rdm_bool", numeric=numeric)
+
+
+@register_generator("rdm_date")
+class RdmDate(IndexedGenerator):
+    # ISO formatted dates between start and end (included), as ones of SQL DATE columns
+
+    def __init__(self, start="2000-01-01", end="2030-12-31", rng=None, unique=False):
+        self.start = start
+        self.end = end
+        self.first = datetime.date.fromisoformat(start).toordinal()
+        super().__init__(datetime.date.fromisoformat(end).toordinal() - self.first + 1, rng, unique)
+
+    def value_from_ind(self, ind):
+        return datetime.date.fromordinal(self.first + ind).isoformat()
+
+    def random_batch(self, n):
+        return [self.value_from_ind(ind) for ind in random.choices(range(self.domain_size), k=n)]
+
+
+def generator_rdm_date(start="2000-01-01", end="2030-12-31", rng=None, unique=False):
+    return RdmDate(start, end, rng, unique)
+
+
+def get_generator_rdm_date(start="2000-01-01", end="2030-12-31"):
+    return GeneratorFactory("rdm_date", start=start, end=end)
+
+
+def get_generator_concat(attr_names, sep='-', missing_val="UNK"):
+    # attribute to generate after attr_names ones (with a greater gen_order)
+    return GeneratorFactory("concat", attr_names=tuple(attr_names), sep=sep, missing_val=missing_val)
 
 
 if __name__ == "__main__":
     gen_fct = generator_increment_int()
     gen_fct2 = generator_increment_str(letters='ab')
     print([next(gen_fct) for i in range(10)])
-    print([next(gen_fct2) for i in range(10)])
\ No newline at end of file
+    print([next(gen_fct2) for i in range(10)])
+    print("10th, 1000th and 100000th :", gen_fct2.nth(10), gen_fct2.nth(1000), IncrementStr().nth(100000),
+          "batch after advancing 5 :", gen_fct2.advance(5) or gen_fct2.batch(5))
+    word_path = "/usr/share/dict/words" if os.path.exists("/usr/share/dict/words") else __file__
+    print(list(islice(generator_word(word_path), 5)), list(islice(generator_word(word_path, rdm=True), 5)))
+    from src.model.randomness import RandomStream
+    seeded = generator_rdm_str(rng=RandomStream(42))
+    print("seeded :", [seeded({}) for _ in range(3)],
+          "batch from same seed :", generator_rdm_str(rng=RandomStream(42)).batch(3))
+    print("unique values of [1, 10] :", generator_rdm_int(1, 10, unique=True).batch(10))
+    print(batch_generated_values(gen_fct, 5), batch_generated_values(generator_rdm_int(0, 9), 5),
+          batch_generated_values(generator_rdm_str(3), 5), batch_generated_values(generator_rdm_bool(), 5))
+    print("dates :", generator_rdm_date(rng=RandomStream(42)).batch(3), generator_rdm_date("2024-02-27", "2024-03-01",
+                                                                                          unique=True).batch(4))
+    import pickle
+    factory = pickle.loads(pickle.dumps(get_generator_rdm_int(1, 6)))
+    dice = pickle.loads(pickle.dumps(factory(rng=RandomStream(7))))
+    print(factory, dice.kind, dice.domain_size, dice.batch(5),
+          GENERATOR_CLASSES["rdm_int"](1, 6, RandomStream(7)).batch(5))
+    concat = get_generator_concat(["a", "b"])()
+    print(concat.kind, concat.batch_columns({"a": ["1", "2", None], "b": ["x", "y", "z"]}, 3), concat({"b": "w"}))
@@ -0,0 +1,141 @@
+import random
+import hashlib
+
+MASK64 = (1 << 64) - 1
+GAMMA = 0x9E3779B97F4A7C15  # golden ratio increment of SplitMix64
+
+
+def mix64(z):
+    # SplitMix64 finalizer, scrambling a 64 bits integer
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EB & MASK64
+    return z ^ (z >> 31)
+
+
+def derived_draws(draw, nbr):
+    # draw followed by nbr-1 draws derived from it, as RandomStream.next64() gives for a value whose first is draw
+    return [draw] + [mix64((draw + ind * GAMMA) & MASK64) for ind in range(1, nbr)]
+
+
+class RandomStream(random.Random):
+    # Counter-based random stream. Values generated from it are ranked : next_value() starts the draws for the value
+    # of next rank, and these draws only depend on the stream key and the rank. The stream can so be jumped ahead
+    # of n values in O(1), and a value is the same whatever draws were done for previous ones. As a random.Random,
+    # all its methods (randint, choices, shuffle, ..) are available to draw within the current value.
+
+    def __init__(self, key=None):
+        self.key = 0
+        self.rank = 0  # rank of the next value
+        self.base = 0  # first draw of the current value, next ones are derived from it
+        self.counter = 0  # nbr of draws done for the current value
+        super().__init__(key)
+
+    def seed(self, a=None, version=2):
+        if a is None:
+            a = random.getrandbits(64)
+        self.key = a & MASK64 if isinstance(a, int) else stable_hash64(a)
+        self.rank = 0
+        self.base = mix64(self.key)
+        self.counter = 0
+
+    def next_value(self):
+        self.base = mix64((self.key + self.rank * GAMMA) & MASK64)
+        self.rank += 1
+        self.counter = 0
+
+    def jump(self, nbr_values):
+        self.rank += nbr_values
+
+    def next64(self):
+        draw = self.base if self.counter == 0 else mix64((self.base + self.counter * GAMMA) & MASK64)
+        self.counter += 1
+        return draw
+
+    def values64(self, nbr_values):
+        # first draw of each of the nbr_values next values (as next_value() then next64() would do for each)
+        start = self.key + self.rank * GAMMA
+        self.rank += nbr_values
+        return [mix64((start + ind * GAMMA) & MASK64) for ind in range(nbr_values)]
+
+    def random(self):
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def getrandbits(self, k):
+        bits, nbr_bits = 0, 0
+        while nbr_bits < k:
+            bits = (bits << 64) | self.next64()
+            nbr_bits += 64
+        return bits >> (nbr_bits - k)
+
+    def getstate(self):
+        return self.key, self.rank, self.base, self.counter
+
+    def setstate(self, state):
+        self.key, self.rank, self.base, self.counter = state
+
+    def __copy__(self):
+        # fresh stream with same key, restarting from the first value
+        return RandomStream(self.key)
+
+
+class KeyedPermutation:
+    # Bijection of range(size) depending on a key, to draw values without replacement in O(1) memory : Feistel
+    # network over the smallest even nbr of bits covering size, a value out of range being walked through the
+    # network again until it falls in range (cycle walking, less than 4 walks on average)
+    ROUNDS = 4
+
+    def __init__(self, size, key):
+        self.size = size
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.half_mask = (1 << self.half_bits) - 1
+        self.round_keys = [mix64((key + (ind + 1) * GAMMA) & MASK64) for ind in range(self.ROUNDS)]
+
+    def __getitem__(self, ind):
+        half_bits, half_mask = self.half_bits, self.half_mask
+        value = ind
+        while True:
+            left, right = value >> half_bits, value & half_mask
+            for round_key in self.round_keys:
+                left, right = right, left ^ (mix64(right ^ round_key) & half_mask)
+            value = (left << half_bits) | right
+            if value < self.size:
+                return value
+
+    def __len__(self):
+        return self.size
+
+
+def stable_hash64(obj):
+    # hash of the repr of obj, stable between processes and runs (unlike builtin hash on strings)
+    return int.from_bytes(hashlib.blake2b(repr(obj).encode(), digest_size=8).digest(), "little")
+
+
+class GenerationContext:
+    # Holds the seed of a generation run, from which independent random streams are derived by name
+    # (eg. one per relation attribute), so that any part of the run can be generated apart reproducibly.
+
+    def __init__(self, seed):
+        self.seed = seed
+
+    def get_stream(self, *names):
+        return RandomStream(stable_hash64((self.seed,) + names))
+
+    def __str__(self):
+        return f"GenerationContext with seed {self.seed}"
+
+
+if __name__ == "__main__":
+    ctx = GenerationContext(42)
+    stream = ctx.get_stream("rel", "attr")
+    firsts = []
+    for _ in range(5):
+        stream.next_value()
+        firsts.append(stream.randint(0, 100))
+    print("5 first values :", firsts)
+    stream_jumped = ctx.get_stream("rel", "attr")
+    stream_jumped.jump(3)
+    stream_jumped.next_value()
+    print("4th value after jumping 3 values :", stream_jumped.randint(0, 100))
+    print("first draws of 5 values at once :", [draw % 101 for draw in ctx.get_stream("rel", "attr").values64(5)])
+    permutation = KeyedPermutation(10, key=42)
+    print("keyed permutation of range(10) :", [permutation[ind] for ind in range(10)])
@@ -1,7 +1,12 @@
 from operator import itemgetter
 from src.model.attribute import AttributeInfo
 from src.instantiation.relinstance import RelationInstance
-from src.utils.utilfunctions import single_to_tuple, get_indexes, normalize_gen_param, fill_tuple_dflt_vals
+from src.utils.utilfunctions import single_to_tuple, get_indexes, normalize_gen_param, fill_tuple_dflt_vals, \
+    run_in_processes
+from src.model.randomness import GenerationContext
+from functools import partial
+from itertools import chain, repeat, islice
+import random
 
 
 class KeyMaterialError(ValueError):
@@ -11,11 +16,107 @@ class KeyMaterialError(ValueError):
         self.relation = relation
 
 
+class GenerationPlan:
+    # Schema work needed to generate tuples of a relation for a fixed sequence of attributes, done once :
+    # attributes to generate ordered (following generation order, PK first among attributes of a same order) and
+    # positions of the fixed attributes among all relation attributes. Generating tuples then only executes the plan.
+    # Tuples are generated by stages, one per gen_order level, each generating whole columns of its attributes.
+
+    def __init__(self, relation, attr_sequence_order=None):
+        self.relation = relation
+        pk_attr, others_attr = relation.get_all_attr()
+        self.attr_sequence = list(pk_attr + others_attr if attr_sequence_order is None else attr_sequence_order)
+        # all attributes of the relation in generation order, as (AttributeInfo, attr_name_in_rel). PK attributes may
+        # be derived from others (eg. a concatenation of lower order attributes), so they are generated after them
+        self.gen_sequence = sorted(relation.get_attr_infos(pk_attr) + relation.get_attr_infos(others_attr),
+                                   key=lambda attr: attr[0].get_gen_order())
+        self.attr_names = [attr_name for _, attr_name in self.gen_sequence]
+        positions = {attr_name: pos for pos, attr_name in enumerate(self.attr_names)}
+        # position among attr_names of each fixed attribute (None if not in relation, so never generated)
+        self.out_positions = [positions.get(attr_name) for attr_name in self.attr_sequence]
+        # batch stages, as [[pos_attr1, pos_attr2, ..], ..], grouping consecutive attributes of same gen_order
+        self.stages = []
+        for pos, (attr_info, _) in enumerate(self.gen_sequence):
+            if pos == 0 or attr_info.get_gen_order() != self.gen_sequence[pos - 1][0].get_gen_order():
+                self.stages.append([])
+            self.stages[-1].append(pos)
+
+    def generate_tuple(self, given_attr_values, keep_attr_name=True):
+        valued_attributes = given_attr_values.copy()
+        for attr_info, attr_name in self.gen_sequence:
+            if not(attr_name in given_attr_values):
+                # generate value considering all previous values already generated for others (with <= order)
+                valued_attributes[attr_name] = attr_info.get_generated_value(valued_attributes)
+        tup = []
+        for attr_name in self.attr_sequence:
+            if not valued_attributes.get(attr_name, False):
+                self.raise_not_generated(attr_name)
+            tup.append((attr_name, valued_attributes[attr_name]) if keep_attr_name else valued_attributes[attr_name])
+        return tuple(tup)
+
+    def generate_tuples(self, given_attr_values_list, keep_attr_name=True):
+        nbr = len(given_attr_values_list)
+        columns = []  # aligned with attr_names, as [val_row1, val_row2, ..] where None is a value to generate
+        for attr_name in self.attr_names:
+            columns.append([given_attr_values.get(attr_name) for given_attr_values in given_attr_values_list])
+        for stage in self.stages:
+            # columns of others stages (not modified by this one), given to column-wise generators of the stage
+            stage_columns = None
+            for pos in stage:
+                attr_info, attr_name = self.gen_sequence[pos]
+                column = columns[pos]
+                missing = [row for row, val in enumerate(column) if val is None]
+                if not missing:
+                    continue
+                context = None
+                if attr_info.needs_columns():
+                    if stage_columns is None:
+                        stage_columns = {self.attr_names[o_pos]: o_column for o_pos, o_column in enumerate(columns)
+                                         if o_pos not in stage}
+                    context = stage_columns if len(missing) == nbr else \
+                        {o_name: [o_column[row] for row in missing] for o_name, o_column in stage_columns.items()}
+                elif attr_info.needs_context():  # others attributes values known for rows where a value is missing
+                    context = {}
+                    for o_pos, o_column in enumerate(columns):
+                        if o_pos != pos:
+                            context[self.attr_names[o_pos]] = o_column if len(missing) == nbr else \
+                                [o_column[row] for row in missing]
+                values = attr_info.get_generated_values(len(missing), context)
+                if len(missing) == nbr:
+                    columns[pos] = values
+                else:
+                    for row, val in zip(missing, values):
+                        column[row] = val
+        # fix values of generated tuples in sequence order given
+        fixed_columns = []
+        for attr_name, pos in zip(self.attr_sequence, self.out_positions):
+            if pos is None or None in columns[pos] or '' in columns[pos]:
+                self.raise_not_generated(attr_name)
+            fixed_columns.append(columns[pos])
+        if keep_attr_name:
+            return [tuple(zip(self.attr_sequence, tup)) for tup in zip(*fixed_columns)]
+        return list(zip(*fixed_columns))
+
+    def count_draws(self, given_attr_values_list):
+        # nbr of values each attribute generator has to produce to generate tuples from given attribute values
+        return {attr_name: sum(1 for given_attr_values in given_attr_values_list if attr_name not in given_attr_values)
+                for attr_name in self.attr_names}
+
+    def raise_not_generated(self, attr_name):
+        err = f"Queried attribute {attr_name} wasn't generated in the tuple for relation {self.relation.name}"
+        raise KeyMaterialError(err, self.relation)
+
+    def __str__(self):
+        gen_seq = ', '.join(f"{attr_name} [{attr_info.get_gen_order()}]" for attr_info, attr_name in self.gen_sequence)
+        return f"Generation plan of {self.relation.name} : generating {gen_seq} | fixing {','.join(self.attr_sequence)}"
+
+
 class Relation:
 
     def __init__(self, name, attributes=None, pk=None):
         self.name = name
         self.attributes = {}
+        self.gen_plans = {}  # {tuple_attr_sequence: GenerationPlan} compiled from schema
         self.treat_attributes(attributes)
         self.pk = []
         self.define_pk(pk)
@@ -26,6 +127,7 @@ class Relation:
     def add_attribute(self, attrib_info, pk=False, name=None):
         name_in_rel = attrib_info.name if name is None else name
         self.attributes[name_in_rel] = attrib_info
+        self.gen_plans = {}
         if pk:
             if not(name_in_rel in self.pk):
                 self.pk.append(name_in_rel)
@@ -63,6 +165,7 @@ class Relation:
             self.fks[attr_names] = foreign_rel_mapping
 
     def define_pk(self, pk):
+        self.gen_plans = {}
         if isinstance(pk, str):
             self.pk = [pk]
         elif isinstance(pk, AttributeInfo):
@@ -83,60 +186,131 @@ class Relation:
 
     # ---- TUPLES/INSTANCES GENERATION FROM SCHEMA ----
 
+    def set_generation_context(self, context):
+        # each attribute generator draws from its own stream, named after the relation and attribute
+        for attr_name, attr in self.attributes.items():
+            attr.set_rng(context.get_stream(self.name, attr_name))
+
     def reset_attr_generators(self):
         for attr_infos in self.attributes.values():
             attr_infos.reset_generator()
 
-    def fix_tuple_values(self, valued_attributes, attr_sequence_order=None, keep_attr_name=True):
-        # from generated tuple values, fix them following a given sequence of attributes name, return corresp. values
-        tup = []
-        if attr_sequence_order is None:
-            attr_sequence_order = self.get_dflt_attr_sequence()
-        for attr_name in attr_sequence_order:
-            if valued_attributes.get(attr_name, False):
-                if keep_attr_name:
-                    tup.append((attr_name, valued_attributes[attr_name]))
-                else:
-                    tup.append(valued_attributes[attr_name])
-            else:
-                err = f"Queried attribute {attr_name} wasn't generated in the tuple for relation {self.name}"
-                raise KeyMaterialError(err, self)
-        return tuple(tup)
-
-    def generate_tuple_missing_val(self, attr_info_missing, already_known_val):
-        for attr_info, attr_name in attr_info_missing:  # assuming it's ordered following generation order
-            # generate value for attr considering all previous value already generated for others (with <= order)
-            already_known_val[attr_name] = attr_info.get_generated_value(already_known_val)  # side-effect on dict
+    def get_generation_plan(self, attr_sequence_order=None):
+        # compiled plans are kept per sequence of attributes, until the schema changes
+        key = None if attr_sequence_order is None else tuple(attr_sequence_order)
+        plan = self.gen_plans.get(key)
+        if plan is None:
+            plan = GenerationPlan(self, attr_sequence_order)
+            self.gen_plans[key] = plan
+        return plan
 
     def generate_tuple(self, given_attr_values, attr_sequence_order=None, keep_attr_name=True):
-        attr_pk_not_valued, attr_not_valued = [], []
-        for attr in self.attributes:
-            if not(attr in given_attr_values):
-                if self.pk_contains(attr):
-                    attr_pk_not_valued.append(attr)
-                else:
-                    attr_not_valued.append(attr)
-        given_attr_values = given_attr_values.copy()
-        # generate first missing values for attr in PK, ordering generation with order value defined in each attr_info
-        self.generate_tuple_missing_val(self.get_attr_infos(attr_pk_not_valued), given_attr_values)
-        # generate second others attr, considering generated value for PK (side-effect on given_attr_values)
-        self.generate_tuple_missing_val(self.get_attr_infos(attr_not_valued), given_attr_values)
-        # fix values of generated tuple in sequence order given, return it as a tuple ((attr1, val1), (attr2, val2),...)
-        return self.fix_tuple_values(given_attr_values, attr_sequence_order, keep_attr_name)
-
-    def generate_instance(self, param_generation, attr_sequence_order=None, respect_fk_constraint=True, respect_pk=True):
+        # generate missing values following the generation plan (order value defined in each attr_info, PK first
+        # among attributes of a same order). Return tuple fixing values in sequence order given, as
+        # ((attr1, val1), (attr2, val2),...)
+        return self.get_generation_plan(attr_sequence_order).generate_tuple(given_attr_values, keep_attr_name)
+
+    def generate_tuples(self, given_attr_values_list, attr_sequence_order=None, keep_attr_name=True):
+        # same as generate_tuple for each given attribute values, but generating values column by column
+        plan = self.get_generation_plan(attr_sequence_order)
+        return plan.generate_tuples(given_attr_values_list, keep_attr_name)
+
+    def generate_instance(self, param_generation, attr_sequence_order=None, respect_fk_constraint=True, respect_pk=True,
+                          columnar=False, shards=1, context=None, sink=None, chunk_size=None):
+        # context, a GenerationContext, seeds the attribute generators to get a reproducible instance
+        # sink, if given, receives generated tuples that are not kept in instance (see RelationInstance)
+        # chunk_size, if given, bounds the nbr of tuples generated at once (shards are then not used)
         param_generation = normalize_gen_param(param_generation)
         if attr_sequence_order is None:
             attr_sequence_order = self.get_dflt_attr_sequence()
+        if chunk_size:
+            rel_inst = self.create_instance(attr_sequence_order, columnar=columnar, context=context, sink=sink)
+            given_attr_vals_iter = chain.from_iterable(repeat(given_attr_vals, nbr_tuples)
+                                                       for nbr_tuples, given_attr_vals in param_generation)
+            o_rel_tuples_fk = {}
+            # FK values are kept once for all chunks, so that demands grow with the nbr of distinct FK values only
+            seen_fk_vals = {}
+            for chunk in iter(lambda: list(islice(given_attr_vals_iter, chunk_size)), []):
+                _, chunk_tuples_fk = rel_inst.generate_and_feed_tuples(chunk, respect_pk=respect_pk,
+                                                                       respect_fk_constraint=respect_fk_constraint,
+                                                                       retry_pk_duplicates=respect_pk,
+                                                                       seen_fk_vals=seen_fk_vals)
+                for o_rel, tuples in chunk_tuples_fk.items():
+                    o_rel_tuples_fk.setdefault(o_rel, []).extend(tuples)
+            return rel_inst, o_rel_tuples_fk
         tuples_with_given_vals = []
         for nbr_tuples, given_attr_vals in param_generation:
             # from entries (nbr, {attr1: val1, attr2, val2}) to {attr1: val1, attr2, val2} nbr times in a list
             tuples_with_given_vals.extend([given_attr_vals]*nbr_tuples)
-        rel_inst = RelationInstance(self.__copy__(), attr_sequence_order)
+        if shards > 1 and len(tuples_with_given_vals) > 1 and context is None:
+            # shards draw from the same streams (to not draw same values as keys in different shards)
+            context = GenerationContext(random.getrandbits(64))
+        rel_inst = self.create_instance(attr_sequence_order, columnar=columnar, context=context)
+        if shards > 1 and len(tuples_with_given_vals) > 1:
+            state, origins = self.generate_shards_state(tuples_with_given_vals, attr_sequence_order, shards,
+                                                        respect_pk, context)
+            rejected = []
+            generated = rel_inst.restore_generated_state(state, respect_pk=respect_pk, rejected=rejected)
+            if rejected:
+                # tuples of different shards duplicating PK values (eg. drawn by random generators not supporting
+                # unique values) are generated again, from the given attribute values each was generated from
+                rejected_given_vals = [tuples_with_given_vals[origins[pos]] for pos in rejected]
+                generated += rel_inst.generate_and_feed_tuples(rejected_given_vals, respect_fk_constraint=False,
+                                                               retry_pk_duplicates=True)[0]
+            o_rel_tuples_fk = rel_inst.generate_fk_attr_vals(generated) if respect_fk_constraint else {}
+            return rel_inst, o_rel_tuples_fk
         _, o_rel_tuples_fk = rel_inst.generate_and_feed_tuples(tuples_with_given_vals, respect_pk=respect_pk,
-                                                               respect_fk_constraint=respect_fk_constraint)
+                                                               respect_fk_constraint=respect_fk_constraint,
+                                                               retry_pk_duplicates=respect_pk)
         return rel_inst, o_rel_tuples_fk
 
+    def generate_shards_state(self, tuples_with_given_vals, attr_sequence_order, shards, respect_pk=True,
+                              context=None):
+        # generate tuples split in consecutive shards, each in a worker process. Generators of a shard first skip
+        # values drawn for previous shards, so incrementing ones produce disjoint ranges and shards concatenated
+        # are generated as a single instance would be. Return merged state as RelationInstance.get_generated_state
+        # and the position in tuples_with_given_vals of the given values each of its tuples was generated from
+        shard_size = -(-len(tuples_with_given_vals) // shards)
+        shard_bounds = [(start, start + shard_size) for start in range(0, len(tuples_with_given_vals), shard_size)]
+
+        tasks = [partial(self.generate_shard, tuples_with_given_vals, start, end, attr_sequence_order, respect_pk,
+                         context) for start, end in shard_bounds]
+        merged_triples = []
+        merged_draws = {}
+        merged_pk_rejected = 0
+        merged_origins = []
+        for (triples, draws, nbr_pk_rejected), origins in run_in_processes(tasks, len(tasks)):
+            merged_triples.extend(triples)
+            merged_draws = draws  # draws of last shard count values drawn for all previous ones
+            merged_pk_rejected += nbr_pk_rejected
+            merged_origins.extend(origins)
+        return (merged_triples, merged_draws, merged_pk_rejected), merged_origins
+
+    def generate_shard(self, tuples_with_given_vals, start, end, attr_sequence_order, respect_pk, context):
+        # state of the shard of tuples_with_given_vals[start:end], with origins as in generate_shards_state
+        shard_inst = self.create_instance(attr_sequence_order, context=context)
+        previous_draws = shard_inst.gen_plan.count_draws(tuples_with_given_vals[:start])
+        for attr_name, nbr in previous_draws.items():
+            shard_inst.rel_model.attributes[attr_name].skip_values(nbr)
+        # PK duplicates inside the shard are discarded here, between shards when merging states
+        origins = []
+        shard_inst.generate_and_feed_tuples(tuples_with_given_vals[start:end], respect_fk_constraint=False,
+                                            respect_pk=respect_pk, retry_pk_duplicates=respect_pk, origins=origins)
+        return shard_inst.get_generated_state(), [start + pos for pos in origins]
+
+    def create_instance(self, attr_sequence_order=None, columnar=False, context=None, sink=None):
+        # empty instance, generating tuples with fresh copies of attribute generators (seeded from context if given)
+        if attr_sequence_order is None:
+            attr_sequence_order = self.get_dflt_attr_sequence()
+        rel_copy = self.__copy__()
+        if len(rel_copy.pk) == 1:  # values of a single attribute PK are drawn without replacement
+            rel_copy.attributes[rel_copy.pk[0]].set_unique()
+        rng = None
+        if context is not None:
+            rel_copy.set_generation_context(context)
+            rng = context.get_stream(self.name, "#instance")
+        return RelationInstance(rel_copy, attr_sequence_order, columnar=columnar, rng=rng, sink=sink)
+
     # ---- UTILITIES ----
 
     def is_in_fks(self, attr):
@@ -264,6 +438,24 @@ if __name__ == "__main__":
                                 "attr2": attr2,
                                 "attr3": fk_str})
 
+    from src.model.generators import get_generator_concat
+    print("same composition column-wise, attr3 column generated at once from attr1 and attr2 columns")
+    CRel = Relation("CRel", pk="pkattr",
+                    attributes={"pkattr": pk_int, "attr1": attr1, "attr2": attr2,
+                                "attr3": AttributeInfo("imfk", attr_type=AttributeTypes.str, gen_order=2,
+                                                       get_generator_fun=get_generator_concat(["attr1", "attr2"]))})
+    print(CRel.get_generation_plan(), CRel.generate_tuples([{}] * 3, keep_attr_name=False), sep='\n')
+    print("PK derived from others attributes, generated after them whatever its place among attributes")
+    DRel = Relation("DRel", pk="code",
+                    attributes={"code": AttributeInfo("code", attr_type=AttributeTypes.str, gen_order=2,
+                                                      get_generator_fun=get_generator_concat(["attr1", "attr2"])),
+                                "attr1": attr1, "attr2": attr2})
+    derived_inst, _ = DRel.generate_instance(5)
+    derived_tuples = DRel.generate_tuples([{}] * 5, keep_attr_name=False)
+    print(DRel.get_generation_plan(), derived_inst, sep='\n')
+    print("derived PK values made of generated attributes :",
+          all(code == f"{val1}-{val2}" for code, val1, val2 in derived_tuples))
+
     RRel = Relation("RRel", pk="attr3", attributes={"attr3": AttributeInfo("attr3", attr_type=AttributeTypes.str)})
     SRel.add_fk_constraint({"attr3": (RRel, {"attr3": "pk_in_o_rel"})})
 
@@ -0,0 +1,79 @@
+from src.utils.dbexport import COMPRESSIONS
+from itertools import islice
+import json
+import os
+
+# Reader of ASP facts as written by write_db_inst (see RelationInstance.iter_ASP), one "name(v1,..,vn)." fact per
+# line, from a file (decompressed following its extension) or a directory of files listed in its manifest.json (as
+# written by dbexport.export_asp_shards). Values are read as written, so lower cased.
+
+
+class ASPSyntaxError(ValueError):
+    pass
+
+
+def open_input(path):
+    # text file for reading at path, decompressed if its extension is the one of a compression of COMPRESSIONS
+    for compression, (open_fun, extension, _) in COMPRESSIONS.items():
+        if compression is not None and path.endswith(extension):
+            return open_fun(path, 'rt')
+    return open(path, buffering=1 << 20)
+
+
+def get_fact_paths(source):
+    # files of facts of source, a file or a directory with a manifest
+    if not os.path.isdir(source):
+        return [source]
+    with open(os.path.join(source, "manifest.json")) as fp:
+        manifest = json.load(fp)
+    return [os.path.join(source, shard["file"]) for rel in manifest["relations"].values() for shard in rel["shards"]]
+
+
+def iter_source_lines(source):
+    for path in get_fact_paths(source):
+        with open_input(path) as fp:
+            yield from fp
+
+
+def parse_fact(line):
+    # (fact name, tuple of values) of a fact line, None for an empty or comment line
+    line = line.strip()
+    if not line or line[0] == '%':
+        return None
+    name, parenthesis, args = line.partition('(')
+    if not parenthesis or not args.endswith(").") or not name:
+        raise ASPSyntaxError(f"Not a fact name(v1,..,vn). : {line}")
+    return name, tuple(args[:-2].split(','))
+
+
+def iter_fact_chunks(lines, chunk_size=100000):
+    # facts of lines as lists of (fact name, tuple of values), by chunks of chunk_size lines
+    lines = iter(lines)
+    chunk = list(islice(lines, chunk_size))
+    while chunk:
+        yield [fact for fact in map(parse_fact, chunk) if fact is not None]
+        chunk = list(islice(lines, chunk_size))
+
+
+if __name__ == "__main__":
+    from src.model.relation import Relation
+    from src.model.attribute import AttributeInfo, AttributeTypes
+    from src.instantiation.dbinstance import DBInstance
+    from src.utils.utilfunctions import write_db_inst, read_db_inst
+    import tempfile
+
+    print(parse_fact("rrel(1,abc).\n"), parse_fact("% comment"), list(iter_fact_chunks(["a(1).", "b(2,3).", ""], 2)))
+    RRel = Relation("RRel", pk="id", attributes={"id": AttributeInfo("id", attr_type=AttributeTypes.incr_int),
+                                                 "name": AttributeInfo("name", attr_type=AttributeTypes.str)})
+    SRel = Relation("SRel", pk="sid", attributes={"sid": AttributeInfo("sid", attr_type=AttributeTypes.incr_int),
+                                                  "rid": AttributeInfo("rid", attr_type=AttributeTypes.int)})
+    SRel.add_fk_constraint({"rid": (RRel, {"rid": "id"})})
+    db = DBInstance({RRel: 5, SRel: 10}, seed=1)
+    target_dir = tempfile.mkdtemp()
+    write_db_inst(db, target_dir=target_dir)
+    write_db_inst(db, target_dir=target_dir, target_file="sharded", nbr_shards=2, compression="gzip")
+    for target_file in ("database", "sharded"):
+        loaded = read_db_inst({RRel: 0, SRel: 0}, os.path.join(target_dir, f"ASP_{target_file}"), chunk_size=4)
+        print(f"facts loaded from ASP_{target_file} same as written :", sorted(loaded.iter_ASP()) == sorted(db.iter_ASP()))
+    loaded.degenerate_insts({SRel: 3})
+    print(loaded)
@@ -0,0 +1,401 @@
+from src.model.relation import Relation, KeyMaterialError
+from src.model.attribute import AttributeInfo, AttributeTypes
+from src.model.generators import get_generator_rdm_str
+import warnings
+import hashlib
+import pickle
+import os
+import re
+
+# Parser of SQL DDL (CREATE TABLE statements, and ALTER TABLE .. ADD columns/PK/FKs) into Relation objects.
+# Columns get an attribute type from their SQL type, and relations their PK and FKs (composite and referencing
+# renamed attributes). Other statements (CREATE INDEX, INSERT,..) and constraints (CHECK, UNIQUE,..) are ignored.
+
+PARSER_FORMAT = 2  # to increase when relations built from a same DDL change (invalidates cached ones)
+
+TOKEN_RE = re.compile(r"""\s+|--[^\n]*|/\*.*?\*/|(?P<quoted>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])
+                          |(?P<string>'(?:[^']|'')*')|(?P<ident>[A-Za-z_][\w$]*)|(?P<number>\d+(?:\.\d*)?)
+                          |(?P<punct>\S)""", re.S | re.X)
+
+# first word of SQL types (upper case) and the attribute type of their columns, others are taken as strings
+DDL_TYPES = {**dict.fromkeys(["INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "MEDIUMINT", "INT2", "INT4", "INT8",
+                              "NUMERIC", "DECIMAL", "NUMBER", "REAL", "FLOAT", "DOUBLE"], AttributeTypes.int),
+             **dict.fromkeys(["SERIAL", "BIGSERIAL", "SMALLSERIAL"], AttributeTypes.incr_int),
+             **dict.fromkeys(["BOOLEAN", "BOOL", "BIT"], AttributeTypes.boolean),
+             **dict.fromkeys(["DATE", "DATETIME", "TIMESTAMP"], AttributeTypes.date)}
+STR_TYPES = {"CHAR", "CHARACTER", "VARCHAR", "NCHAR", "NVARCHAR", "VARCHAR2"}  # whose length bounds generated strings
+
+# words ending the SQL type of a column, starting its constraints
+COLUMN_CONSTRAINTS = {"CONSTRAINT", "PRIMARY", "NOT", "NULL", "UNIQUE", "DEFAULT", "REFERENCES", "CHECK", "COLLATE",
+                      "AUTO_INCREMENT", "AUTOINCREMENT", "IDENTITY", "GENERATED", "ON", "COMMENT"}
+INCREMENTED = {"AUTO_INCREMENT", "AUTOINCREMENT", "IDENTITY"}
+TABLE_CONSTRAINTS = {"CONSTRAINT", "PRIMARY", "FOREIGN", "UNIQUE", "CHECK", "KEY", "INDEX", "FULLTEXT", "SPATIAL",
+                     "EXCLUDE"}
+
+
+class DDLSyntaxError(ValueError):
+
+    def __init__(self, msg, line):
+        super().__init__(f"{msg} (line {line})")
+        self.line = line
+
+
+class TableDefinition:
+    # a table as declared in DDL, before being built as a Relation (picklable, so that it can be cached)
+
+    def __init__(self, name):
+        self.name = name
+        self.columns = []  # [(column name, attribute type, max length of strings or None, auto incremented)]
+        self.pk = []
+        self.fks = []  # [(columns, referenced table name, referenced columns or None for its PK)]
+
+    def __str__(self):
+        return f"{self.name}({', '.join(col[0] for col in self.columns)}) PK {self.pk} FKs {self.fks}"
+
+
+class DDLParser:
+
+    def __init__(self, text):
+        self.text = text
+        # [(kind, value, position)], kind as "ident", "quoted", "string", "number" or "punct"
+        self.tokens = [(match.lastgroup, match.group(match.lastgroup), match.start())
+                       for match in TOKEN_RE.finditer(text) if match.lastgroup is not None]
+        self.ind = 0
+        self.tables = {}  # {lower case table name: TableDefinition}, in declaration order
+
+    # ---- TOKENS ----
+
+    def peek(self, offset=0):
+        ind = self.ind + offset
+        return self.tokens[ind] if ind < len(self.tokens) else (None, None, len(self.text))
+
+    def next(self):
+        token = self.peek()
+        self.ind += 1
+        return token
+
+    def is_keyword(self, *keywords, offset=0):
+        kind, value, _ = self.peek(offset)
+        return kind == "ident" and value.upper() in keywords
+
+    def accept(self, *keywords):
+        # consume the next tokens if they are keywords (or punctuation) in that order
+        for offset, keyword in enumerate(keywords):
+            kind, value, _ = self.peek(offset)
+            if (value.upper() if kind == "ident" else value if kind == "punct" else None) != keyword:
+                return False
+        self.ind += len(keywords)
+        return True
+
+    def expect(self, *keywords):
+        if not self.accept(*keywords):
+            self.error(f"Expected {' '.join(keywords)}")
+
+    def error(self, msg):
+        kind, value, pos = self.peek()
+        found = "end of DDL" if kind is None else repr(value)
+        raise DDLSyntaxError(f"{msg}, found {found}", self.text.count('\n', 0, pos) + 1)
+
+    def parse_name(self):
+        # identifier, unquoted, possibly qualified by schema (only its last part is kept)
+        kind, value, _ = self.next()
+        if kind == "quoted":
+            name = value[1:-1].replace('""', '"')
+        elif kind == "ident":
+            name = value
+        else:
+            self.ind -= 1
+            self.error("Expected a name")
+        if self.accept('.'):
+            return self.parse_name()
+        return name
+
+    def parse_names(self):
+        # (name, name, ..), ASC/DESC/lengths of indexed columns ignored
+        self.expect('(')
+        names = [self.parse_name()]
+        self.skip_item()
+        while self.accept(','):
+            names.append(self.parse_name())
+            self.skip_item()
+        self.expect(')')
+        return names
+
+    def skip_group(self):
+        # tokens until the closing parenthesis of the one just consumed
+        depth = 1
+        while depth:
+            kind, value, _ = self.next()
+            if kind is None:
+                self.error("Unclosed parenthesis")
+            if kind == "punct":
+                depth += {'(': 1, ')': -1}.get(value, 0)
+
+    def skip_item(self):
+        # tokens until ',' or ')' ending the current item of a parenthesized list, or ';' ending a statement
+        while self.peek()[0] is not None and self.peek()[1] not in (',', ')', ';'):
+            if self.next()[1] == '(':
+                self.skip_group()
+
+    def skip_statement(self):
+        while self.peek()[0] is not None and not self.accept(';'):
+            if self.next()[1] == '(':
+                self.skip_group()
+
+    # ---- STATEMENTS ----
+
+    def parse(self):
+        while self.peek()[0] is not None:
+            if self.accept(';'):
+                continue
+            start = self.ind
+            if self.accept("CREATE"):
+                while self.is_keyword("TEMP", "TEMPORARY", "UNLOGGED", "GLOBAL", "LOCAL", "OR", "REPLACE"):
+                    self.next()
+                if self.accept("TABLE"):
+                    self.parse_create_table()
+                    continue
+            elif self.accept("ALTER", "TABLE"):
+                self.parse_alter_table()
+                continue
+            self.ind = start
+            self.skip_statement()
+        return self.tables
+
+    def parse_create_table(self):
+        self.accept("IF", "NOT", "EXISTS")
+        table = TableDefinition(self.parse_name())
+        if table.name.lower() in self.tables:
+            self.error(f"Table {table.name} already defined")
+        self.expect('(')
+        self.parse_table_item(table)
+        while self.accept(','):
+            self.parse_table_item(table)
+        self.expect(')')
+        self.skip_statement()  # table options
+        self.tables[table.name.lower()] = table
+
+    def parse_alter_table(self):
+        self.accept("ONLY")
+        self.accept("IF", "EXISTS")
+        name = self.parse_name()
+        table = self.tables.get(name.lower())
+        if table is None:
+            self.error(f"Altered table {name} not defined before")
+        while self.accept("ADD"):
+            if self.is_keyword(*TABLE_CONSTRAINTS):
+                self.parse_table_constraint(table)
+            else:
+                self.accept("COLUMN")
+                self.accept("IF", "NOT", "EXISTS")
+                self.parse_column(table)
+            if not self.accept(','):
+                break
+        self.skip_statement()
+
+    def parse_table_item(self, table):
+        if self.is_keyword("KEY", "INDEX", "FULLTEXT", "SPATIAL", "LIKE"):
+            self.skip_item()
+        elif self.is_keyword(*TABLE_CONSTRAINTS):
+            self.parse_table_constraint(table)
+        else:
+            self.parse_column(table)
+
+    def parse_table_constraint(self, table):
+        if self.accept("CONSTRAINT"):
+            self.parse_name()
+        if self.accept("PRIMARY", "KEY"):
+            table.pk = self.parse_names()
+        elif self.accept("FOREIGN", "KEY"):
+            if self.peek()[1] != '(':
+                self.parse_name()  # index name (MySQL)
+            columns = self.parse_names()
+            table.fks.append((columns,) + self.parse_references())
+        self.skip_item()
+
+    def parse_references(self):
+        # (referenced table name, referenced columns or None)
+        self.expect("REFERENCES")
+        ref_name = self.parse_name()
+        return ref_name, (self.parse_names() if self.peek()[1] == '(' else None)
+
+    def parse_column(self, table):
+        name = self.parse_name()
+        type_words = []
+        while self.peek()[0] in ("ident", "quoted") and not self.is_keyword(*COLUMN_CONSTRAINTS):
+            type_words.append(self.next()[1].upper())
+        type_args = []
+        if self.accept('('):
+            while self.peek()[0] == "number" or self.peek()[1] == ',':
+                kind, value, _ = self.next()
+                if kind == "number":
+                    type_args.append(value)
+            self.skip_group()
+        first_word = type_words[0] if type_words else ""
+        attr_type = DDL_TYPES.get(first_word, AttributeTypes.str)
+        max_length = int(type_args[0]) if first_word in STR_TYPES and type_args and type_args[0].isdigit() else None
+        incremented = attr_type == AttributeTypes.incr_int
+        while self.peek()[0] is not None and self.peek()[1] not in (',', ')', ';'):
+            if self.accept("PRIMARY", "KEY"):
+                table.pk = [name]
+            elif self.is_keyword("REFERENCES"):
+                table.fks.append(([name],) + self.parse_references())
+            elif self.is_keyword(*INCREMENTED):
+                self.next()
+                incremented = True
+            elif self.next()[1] == '(':
+                self.skip_group()
+        table.columns.append((name, attr_type, max_length, incremented))
+
+
+def parse_ddl(text):
+    # {lower case table name: TableDefinition} declared in DDL text
+    return DDLParser(text).parse()
+
+
+def get_column_generator(attr_type, max_length):
+    # generator fun for columns of strings bounded by a length lower than generated ones by default
+    if attr_type == AttributeTypes.str and max_length is not None and max_length < 8:
+        return get_generator_rdm_str(max(max_length, 1))
+    return None
+
+
+def build_relations(tables, dropped_fks=None):
+    # {table name: Relation} from {lower case table name: TableDefinition}. An integer single-attribute PK not
+    # referencing another table is auto incremented, as ids of most schemas. FKs referencing columns that are not
+    # in the PK of their table (eg. UNIQUE ones) can't be respected by generation : they are dropped with a warning,
+    # and added to dropped_fks if given, as (table name, FK columns, referenced table name, referenced columns).
+    dropped_fks = [] if dropped_fks is None else dropped_fks
+    relations = {}
+    for table in tables.values():
+        fk_columns = {col.lower() for columns, _, _ in table.fks for col in columns}
+        single_pk = table.pk[0].lower() if len(table.pk) == 1 else None
+        attributes = []
+        for col_name, attr_type, max_length, incremented in table.columns:
+            if incremented or (attr_type == AttributeTypes.int and col_name.lower() == single_pk
+                               and single_pk not in fk_columns):
+                attr_type = AttributeTypes.incr_int
+            gen_fun = get_column_generator(attr_type, max_length)
+            if gen_fun is None:
+                attributes.append(AttributeInfo(col_name, attr_type=attr_type))
+            else:
+                attributes.append(AttributeInfo(col_name, attr_type=attr_type, get_generator_fun=gen_fun))
+        columns = {col[0].lower(): col[0] for col in table.columns}
+        relations[table.name] = Relation(table.name, attributes=attributes,
+                                         pk=[columns.get(col.lower(), col) for col in table.pk])
+    for table in tables.values():
+        relation = relations[table.name]
+        for columns, ref_name, ref_columns in table.fks:
+            ref_table = tables.get(ref_name.lower())
+            if ref_table is None:
+                raise KeyMaterialError(f"FK of {table.name} references undefined table {ref_name}", relation)
+            ref_relation = relations[ref_table.name]
+            ref_names = {col[0].lower(): col[0] for col in ref_table.columns}
+            ref_columns = ref_relation.pk if ref_columns is None else [ref_names.get(col.lower(), col)
+                                                                       for col in ref_columns]
+            if len(ref_columns) != len(columns):
+                raise KeyMaterialError(f"FK of {table.name} on {columns} references {len(ref_columns)} attributes"
+                                       f" of {ref_name}", relation)
+            names = {col[0].lower(): col[0] for col in table.columns}
+            columns = [names.get(col.lower(), col) for col in columns]
+            if not ref_relation.pk_contains(ref_columns):
+                dropped_fks.append((table.name, tuple(columns), ref_relation.name, tuple(ref_columns)))
+                warn_dropped_fk(*dropped_fks[-1])
+                continue
+            relation.add_fk_constraint({tuple(columns): (ref_relation, dict(zip(columns, ref_columns)))})
+    return relations
+
+
+def warn_dropped_fk(table_name, columns, ref_name, ref_columns):
+    warnings.warn(f"FK of {table_name} on {list(columns)} dropped : referenced attributes {list(ref_columns)} are"
+                  f" not in the PK of {ref_name}", stacklevel=3)
+
+
+def get_ddl_key(content):
+    # hash of a DDL file content (bytes), naming its cached relations
+    return hashlib.blake2b(content + f"#{PARSER_FORMAT}".encode(), digest_size=16).hexdigest()
+
+
+def load_ddl_tables(path):
+    # table definitions of DDL file at path
+    with open(path, 'rb') as fp:
+        return parse_ddl(fp.read().decode())
+
+
+def load_ddl_schema(path, cache_dir=None, dropped_fks=None):
+    # {table name: Relation} from DDL file at path (FKs dropped added to dropped_fks, see build_relations). With
+    # cache_dir, built relations are kept there in a file named after a hash of the DDL content, so that an unchanged
+    # DDL file is neither parsed nor built again, only unpickled.
+    dropped_fks = [] if dropped_fks is None else dropped_fks
+    with open(path, 'rb') as fp:
+        content = fp.read()
+    if cache_dir is None:
+        return build_relations(parse_ddl(content.decode()), dropped_fks)
+    cache_path = os.path.join(cache_dir, get_ddl_key(content) + ".ddl.pickle")
+    try:
+        with open(cache_path, 'rb') as fp:
+            relations, cached_dropped_fks = pickle.load(fp)
+        for dropped_fk in cached_dropped_fks:
+            warn_dropped_fk(*dropped_fk)
+        dropped_fks.extend(cached_dropped_fks)
+        return relations
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+    built_dropped_fks = []
+    relations = build_relations(parse_ddl(content.decode()), built_dropped_fks)
+    dropped_fks.extend(built_dropped_fks)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"  # written apart then renamed, as instance cache entries
+    with open(tmp_path, 'wb') as fp:
+        pickle.dump((relations, built_dropped_fks), fp, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    return relations
+
+
+if __name__ == "__main__":
+    import tempfile
+    ddl = """
+    -- university schema, as built from code in examples/fromcode/example1_generation.py
+    CREATE TABLE Faculties (
+        faculty VARCHAR(10) NOT NULL,
+        city VARCHAR(30) DEFAULT 'Mons',
+        sitelabel TEXT,
+        CONSTRAINT pk_fac PRIMARY KEY (faculty, city)
+    );
+    CREATE TABLE "UnivMembers" (
+        matricule INTEGER PRIMARY KEY,
+        persid CHAR(6) UNIQUE,
+        faculty VARCHAR(10),
+        site VARCHAR(30),
+        role VARCHAR(9) CHECK (role IN ('student', 'professor')),
+        birth DATE,
+        FOREIGN KEY (faculty, site) REFERENCES Faculties (faculty, city) ON DELETE CASCADE
+    );
+    CREATE INDEX members_fac ON "UnivMembers" (faculty);
+    CREATE TABLE Courses (id SERIAL PRIMARY KEY, teacher INT REFERENCES "UnivMembers", title VARCHAR(50));
+    ALTER TABLE Courses ADD COLUMN credits INT, ADD CONSTRAINT c_title UNIQUE (title);
+    CREATE TABLE Badges (num INT PRIMARY KEY, owner CHAR(6) REFERENCES "UnivMembers" (persid));
+    """
+    tables = parse_ddl(ddl)
+    print(*tables.values(), sep='\n')
+    dropped_fks = []
+    rels = build_relations(tables, dropped_fks)
+    print("dropped FKs :", dropped_fks)
+    for rel in rels.values():
+        print(rel.name, [(name, attr.attr_type.name) for name, attr in rel.attributes.items()], rel.pk,
+              {attrs: (o_rel.name, mapping) for attrs, (o_rel, mapping) in rel.fks.items()})
+    try:
+        parse_ddl("CREATE TABLE Broken (id INT,\n name TEXT")
+    except DDLSyntaxError as err:
+        print("error :", err)
+
+    from src.instantiation.dbinstance import DBInstance
+    print(DBInstance({rels["Courses"]: 3}, seed=1))
+
+    cache_dir = tempfile.mkdtemp()
+    ddl_path = os.path.join(cache_dir, "schema.sql")
+    with open(ddl_path, 'w') as fp:
+        fp.write(ddl)
+    load_ddl_schema(ddl_path, cache_dir)
+    print("cached :", [name for name in os.listdir(cache_dir) if name.endswith(".ddl.pickle")],
+          list(load_ddl_schema(ddl_path, cache_dir)))
@@ -0,0 +1,292 @@
+from src.model.attribute import AttributeTypes
+from src.instantiation.relinstance import asp_fact_lines
+from src.utils.utilfunctions import write_lines, run_in_processes
+from functools import partial
+from operator import itemgetter
+from itertools import islice
+from zlib import crc32
+import sqlite3
+import shutil
+import json
+import gzip
+import lzma
+import bz2
+import csv
+import os
+
+# stream compressions of output files : {name: (open function, file extension, compression arguments)}
+COMPRESSIONS = {None: (open, "", {}), "gzip": (gzip.open, ".gz", {"compresslevel": 6}),
+                "bz2": (bz2.open, ".bz2", {"compresslevel": 9}), "xz": (lzma.open, ".xz", {"preset": 1})}
+
+EXPORT_CHUNK_SIZE = 65536  # nbr of tuples read at once to be written in ASP files
+MIN_PART_SIZE = 100000  # min nbr of tuples of a relation written by a worker process in ASP files
+
+SQL_TYPES = {AttributeTypes.int: "INTEGER", AttributeTypes.incr_int: "INTEGER", AttributeTypes.boolean: "INTEGER",
+             AttributeTypes.str: "TEXT", AttributeTypes.incr_str: "TEXT", AttributeTypes.word_str: "TEXT",
+             AttributeTypes.date: "DATE"}
+
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def iter_rows(rel_inst):
+    # tuples values of a relation instance, whatever the way its tuples are stored
+    return map(itemgetter(0), rel_inst.tuples)
+
+
+def get_fk_references(rel_inst, rel_insts):
+    # [(attrs in rel_inst, referenced relation name, attrs in referenced relation)] for FKs whose attributes
+    # are all kept in both instances
+    references = []
+    for fk_attrs, (o_rel, mapping_names) in rel_inst.rel_model.fks.items():
+        o_rel_inst = rel_insts.get(o_rel.name)
+        if o_rel_inst is None or not all(attr in rel_inst.attribute_fix for attr in fk_attrs):
+            continue
+        o_attrs = [mapping_names[attr] for attr in fk_attrs]
+        if all(attr in o_rel_inst.attribute_fix for attr in o_attrs):
+            references.append((list(fk_attrs), o_rel.name, o_attrs))
+    return references
+
+
+def create_table_sql(rel_inst, rel_insts):
+    # PK is not declared here but as an index created once tuples are loaded (see create_pk_index)
+    columns = [f"{quote_identifier(attr)} {SQL_TYPES.get(rel_inst.rel_model.attributes[attr].attr_type, 'TEXT')}"
+               for attr in rel_inst.attribute_fix]
+    for attrs, o_rel_name, o_attrs in get_fk_references(rel_inst, rel_insts):
+        columns.append(f"FOREIGN KEY ({', '.join(map(quote_identifier, attrs))}) "
+                       f"REFERENCES {quote_identifier(o_rel_name)} ({', '.join(map(quote_identifier, o_attrs))})")
+    return f"CREATE TABLE {quote_identifier(rel_inst.name)} ({', '.join(columns)})"
+
+
+def create_pk_index(cursor, rel_inst):
+    # unique index on PK, or a plain one if tuples (eg. degenerated ones) duplicate PK values
+    pk_attrs = [rel_inst.attribute_fix[ind] for ind in rel_inst.pk_indexes]
+    if not pk_attrs:
+        return
+    table, columns = quote_identifier(rel_inst.name), ', '.join(map(quote_identifier, pk_attrs))
+    duplicated = cursor.execute(f"SELECT 1 FROM {table} GROUP BY {columns} HAVING COUNT(*) > 1 LIMIT 1").fetchone()
+    unique = "" if duplicated else "UNIQUE "
+    cursor.execute(f"CREATE {unique}INDEX {quote_identifier(f'pk_{rel_inst.name}')} ON {table} ({columns})")
+
+
+def export_sqlite(dbinst, path, batch_size=100000):
+    # write all relation instances of dbinst as tables of SQLite database file at path (tables replaced if existing).
+    # Tuples are inserted by batches in a single transaction, PK and FK indexes are created once all tuples are loaded.
+    connection = sqlite3.connect(path, isolation_level=None)
+    try:
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA journal_mode = MEMORY")
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.execute("BEGIN")
+        for rel_inst in dbinst.rel_insts.values():
+            cursor.execute(f"DROP TABLE IF EXISTS {quote_identifier(rel_inst.name)}")
+            cursor.execute(create_table_sql(rel_inst, dbinst.rel_insts))
+            placeholders = ', '.join('?' * len(rel_inst.attribute_fix))
+            insert = f"INSERT INTO {quote_identifier(rel_inst.name)} VALUES ({placeholders})"
+            rows = iter_rows(rel_inst)
+            batch = list(islice(rows, batch_size))
+            while batch:
+                cursor.executemany(insert, batch)
+                batch = list(islice(rows, batch_size))
+        for rel_inst in dbinst.rel_insts.values():
+            create_pk_index(cursor, rel_inst)
+            for ind, (attrs, _, _) in enumerate(get_fk_references(rel_inst, dbinst.rel_insts)):
+                cursor.execute(f"CREATE INDEX {quote_identifier(f'fk{ind}_{rel_inst.name}')} "
+                               f"ON {quote_identifier(rel_inst.name)} ({', '.join(map(quote_identifier, attrs))})")
+        cursor.execute("COMMIT")
+    finally:
+        connection.close()
+
+
+def open_output(path, compression=None):
+    # text file opened for writing at path (extended with the extension of compression), and its actual path
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression {compression}, not in {list(COMPRESSIONS)}")
+    open_fun, extension, kwargs = COMPRESSIONS[compression]
+    path += extension
+    if compression is None:
+        return open(path, 'w', buffering=1 << 20), path
+    return open_fun(path, 'wt', **kwargs), path
+
+
+def write_asp_part(rel_inst, paths, compression=None, start=0, stop=None):
+    # write tuples of rel_inst from start to stop as ASP facts, each in the file of paths (opened with compression)
+    # of its shard : from a CRC32 of its PK values (of all its values without PK), so that tuples with the same PK
+    # values are in the same shard whatever the order of generation. Return the nbr of tuples written per shard.
+    nbr_shards = len(paths)
+    stop = rel_inst.get_size() if stop is None else stop
+    key_indexes = rel_inst.pk_indexes or range(len(rel_inst.attribute_fix))
+    fact_name = rel_inst.rel_model.name.lower()
+    files = [open_output(path, compression)[0] for path in paths]
+    counts = [0] * nbr_shards
+    try:
+        for chunk_start in range(start, stop, EXPORT_CHUNK_SIZE):
+            rows = list(map(itemgetter(0), rel_inst.tuples[chunk_start:min(stop, chunk_start + EXPORT_CHUNK_SIZE)]))
+            if nbr_shards == 1:
+                buckets = [rows]
+            else:
+                buckets = [[] for _ in range(nbr_shards)]
+                for values in rows:
+                    key = '\x1f'.join([values[ind] for ind in key_indexes]).encode()
+                    buckets[crc32(key) % nbr_shards].append(values)
+            for shard, bucket in enumerate(buckets):
+                if bucket:
+                    write_lines(files[shard], asp_fact_lines(fact_name, bucket))
+                    counts[shard] += len(bucket)
+    finally:
+        for fp in files:
+            fp.close()
+    return counts
+
+
+def concat_parts(part_paths, path):
+    # concatenate files at part_paths (removed then) in file at path : compressed streams can be concatenated
+    with open(path, 'wb') as fp:
+        for part_path in part_paths:
+            with open(part_path, 'rb') as part_fp:
+                shutil.copyfileobj(part_fp, fp, 1 << 20)
+            os.remove(part_path)
+
+
+def export_asp_shards(dbinst, target_dir, nbr_shards=1, compression=None, workers=1):
+    # write ASP facts of each relation instance of dbinst in its own file of target_dir, or in nbr_shards files
+    # partitioned by hash of PK values, optionally compressed (see COMPRESSIONS). Tuples are read once : each worker
+    # process formats, shards and compresses a range of tuples of a relation into parts of shard files, concatenated
+    # then. Shard files are listed with their nbr of tuples in target_dir/manifest.json. Return the manifest.
+    if not 1 <= nbr_shards <= 256:
+        raise ValueError(f"Nbr of shards {nbr_shards} not between 1 and 256")
+    os.makedirs(target_dir, exist_ok=True)
+    extension = COMPRESSIONS[compression][1] if compression in COMPRESSIONS else ""
+    tasks, parts = [], []  # parts as [(rel_inst, [part paths of each shard])] aligned with tasks
+    shard_paths = {}  # {rel_name: [path of each shard file, without compression extension]}
+    for rel_inst in dbinst.rel_insts.values():
+        base = os.path.join(target_dir, rel_inst.name)
+        shard_paths[rel_inst.name] = [f"{base}.lp"] if nbr_shards == 1 else \
+            [f"{base}.{shard:03d}.lp" for shard in range(nbr_shards)]
+        size = rel_inst.get_size()
+        nbr_parts = max(1, min(workers, size // MIN_PART_SIZE))
+        part_size = -(-size // nbr_parts)
+        for part, start in enumerate(range(0, max(size, 1), part_size or 1)):
+            paths = shard_paths[rel_inst.name] if nbr_parts == 1 else \
+                [f"{path}.part{part:03d}" for path in shard_paths[rel_inst.name]]
+            tasks.append(partial(write_asp_part, rel_inst, paths, compression, start, min(size, start + part_size)))
+            parts.append((rel_inst, paths))
+    counts = {}  # {rel_name: [nbr of tuples of each shard]}
+    part_paths = {}  # {rel_name: [[part paths of shard] for each shard]}
+    for (rel_inst, paths), part_counts in zip(parts, run_in_processes(tasks, workers)):
+        rel_counts = counts.setdefault(rel_inst.name, [0] * len(paths))
+        for shard, (path, nbr) in enumerate(zip(paths, part_counts)):
+            rel_counts[shard] += nbr
+            part_paths.setdefault(rel_inst.name, [[] for _ in paths])[shard].append(path + extension)
+    manifest = {"format": "asp", "compression": compression, "nbr_shards": nbr_shards, "relations": {}}
+    for rel_inst in dbinst.rel_insts.values():
+        shards = []
+        for path, rel_part_paths, nbr in zip(shard_paths[rel_inst.name], part_paths[rel_inst.name],
+                                             counts[rel_inst.name]):
+            path += extension
+            if rel_part_paths != [path]:
+                concat_parts(rel_part_paths, path)
+            shards.append({"file": os.path.basename(path), "tuples": nbr, "bytes": os.path.getsize(path)})
+        manifest["relations"][rel_inst.name] = {"fact": rel_inst.rel_model.name.lower(),
+                                                "attributes": list(rel_inst.attribute_fix),
+                                                "tuples": rel_inst.get_size(), "shards": shards}
+    with open(os.path.join(target_dir, "manifest.json"), 'w') as fp:
+        json.dump(manifest, fp, indent=1)
+    return manifest
+
+
+def export_csv(dbinst, target_dir):
+    # write each relation instance of dbinst in its own CSV file, named after the relation, with a header line
+    os.makedirs(target_dir, exist_ok=True)
+    for rel_inst in dbinst.rel_insts.values():
+        with open(os.path.join(target_dir, f"{rel_inst.name}.csv"), 'w', newline='', buffering=1 << 20) as fp:
+            writer = csv.writer(fp)
+            writer.writerow(rel_inst.attribute_fix)
+            writer.writerows(iter_rows(rel_inst))
+
+
+class ASPSink:
+    # sink of tuples streamed by a DBInstance, written as ASP facts in file at path as they are generated,
+    # optionally compressed (see COMPRESSIONS)
+
+    def __init__(self, path, compression=None):
+        self.fp = open_output(path, compression)[0]
+
+    def write_tuples(self, rel_inst, triples):
+        self.fp.write(''.join(asp_fact_lines(rel_inst.rel_model.name.lower(), map(itemgetter(0), triples))))
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CSVSink:
+    # sink of tuples streamed by a DBInstance, written in a CSV file per relation (with a header line) in target_dir
+
+    def __init__(self, target_dir):
+        os.makedirs(target_dir, exist_ok=True)
+        self.target_dir = target_dir
+        self.files = {}  # {rel_name: (file object, csv writer)}
+
+    def write_tuples(self, rel_inst, triples):
+        if rel_inst.name not in self.files:
+            fp = open(os.path.join(self.target_dir, f"{rel_inst.name}.csv"), 'w', newline='', buffering=1 << 20)
+            writer = csv.writer(fp)
+            writer.writerow(rel_inst.attribute_fix)
+            self.files[rel_inst.name] = (fp, writer)
+        self.files[rel_inst.name][1].writerows(map(itemgetter(0), triples))
+
+    def close(self):
+        for fp, _ in self.files.values():
+            fp.close()
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    from src.model.relation import Relation
+    from src.model.attribute import AttributeInfo
+    from src.instantiation.dbinstance import DBInstance
+    import tempfile
+
+    RRel = Relation("RRel", pk="id", attributes={"id": AttributeInfo("id", attr_type=AttributeTypes.incr_int),
+                                                 "name": AttributeInfo("name", attr_type=AttributeTypes.str)})
+    SRel = Relation("SRel", pk="sid", attributes={"sid": AttributeInfo("sid", attr_type=AttributeTypes.incr_int),
+                                                  "rid": AttributeInfo("rid", attr_type=AttributeTypes.int),
+                                                  "flag": AttributeInfo("flag", attr_type=AttributeTypes.boolean)})
+    SRel.add_fk_constraint({"rid": (RRel, {"rid": "id"})})
+    db = DBInstance({RRel: 5, SRel: 10}, seed=1)
+    target_dir = tempfile.mkdtemp()
+    export_csv(db, target_dir)
+    export_sqlite(db, os.path.join(target_dir, "database.sqlite"))
+    print("exported in", target_dir, ":", sorted(os.listdir(target_dir)))
+    connection = sqlite3.connect(os.path.join(target_dir, "database.sqlite"))
+    print(connection.execute("SELECT sql FROM sqlite_master").fetchall())
+    print(connection.execute('SELECT COUNT(*), typeof(rid) FROM "SRel" JOIN "RRel" ON rid = id').fetchall())
+    connection.close()
+    with ASPSink(os.path.join(target_dir, "streamed_asp")) as sink:
+        DBInstance({RRel: 5, SRel: 10}, seed=1, sink=sink, chunk_size=4)
+    with open(os.path.join(target_dir, "streamed_asp")) as fp:
+        # facts of relations are interleaved, as written while generating
+        print("streamed ASP facts same as generated ones :", sorted(fp) == sorted(db.iter_ASP()))
+    manifest = export_asp_shards(db, os.path.join(target_dir, "asp_shards"), nbr_shards=3, compression="gzip",
+                                 workers=2)
+    print({rel_name: [(shard["file"], shard["tuples"]) for shard in rel["shards"]]
+           for rel_name, rel in manifest["relations"].items()})
+    facts = []
+    for rel in manifest["relations"].values():
+        for shard in rel["shards"]:
+            with gzip.open(os.path.join(target_dir, "asp_shards", shard["file"]), 'rt') as fp:
+                facts.extend(fp)
+    print("sharded ASP facts same as generated ones :", sorted(facts) == sorted(db.iter_ASP()))
@@ -53,19 +53,159 @@ def get_indexes(base, find_in):
     return indexes
 
 
-def write_db_inst(dbinst, asp=True, printed=False, target_dir=".", target_file="database"):
+def strongly_connected_components(graph):
+    # graph as {node: [successor nodes]}, return its strongly connected components (lists of nodes) in topological
+    # order : a component comes before all components its nodes have edges to (iterative Tarjan algorithm)
+    index, lowlink, on_stack = {}, {}, set()
+    stack, components = [], []
+    for root in graph:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        visiting = [(root, iter(graph.get(root, ())))]
+        while visiting:
+            node, successors = visiting[-1]
+            for succ in successors:
+                if succ not in index:
+                    index[succ] = lowlink[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    visiting.append((succ, iter(graph.get(succ, ()))))
+                    break
+                if succ in on_stack:
+                    lowlink[node] = min(lowlink[node], index[succ])
+            else:
+                visiting.pop()
+                if visiting:
+                    parent = visiting[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component[::-1])
+    # Tarjan emits a component after all components reachable from it
+    return components[::-1]
+
+
+_FORKED_TASKS = []  # tasks to run in worker processes, inherited by them when forked
+
+
+def _run_forked_task(ind):
+    return _FORKED_TASKS[ind]()
+
+
+def _run_pickled_task(pickled_task):
+    import pickle
+    return pickle.loads(pickled_task)()
+
+
+def pickle_tasks(tasks):
+    # tasks pickled to be sent to worker processes started fresh, None if they can't be: not picklable, or referring
+    # to objects of the __main__ module (defined in a script, maybe under its `if __name__` guard, so not importable)
+    import pickle
+    try:
+        pickled = [pickle.dumps(task) for task in tasks]
+    except Exception:
+        return None
+    return None if any(b"__main__" in task for task in pickled) else pickled
+
+
+def run_in_processes(tasks, workers=1):
+    # run funs taking no argument in a pool of worker processes if workers > 1, returning their results in order.
+    # Tasks are inherited by forked workers, or where processes can't be forked (eg. Windows), pickled and sent to
+    # workers started by forkserver or spawn, which import the __main__ module : scripts must then start generation
+    # under an `if __name__ == "__main__":` guard. Results have to be picklable. Fall back on running tasks here if
+    # no pool can run them (unpicklable tasks without fork, or already in a worker process).
+    global _FORKED_TASKS
+    import multiprocessing
+    import random
+    start_methods = multiprocessing.get_all_start_methods()
+    if workers <= 1 or len(tasks) <= 1 or multiprocessing.current_process().daemon:
+        return [task() for task in tasks]
+    nbr_workers = min(workers, len(tasks))
+    if "fork" not in start_methods:
+        pickled = pickle_tasks(tasks)
+        if pickled is None:
+            return [task() for task in tasks]
+        context = multiprocessing.get_context("forkserver" if "forkserver" in start_methods else "spawn")
+        with context.Pool(nbr_workers) as pool:
+            return pool.map(_run_pickled_task, pickled, chunksize=1)
+    _FORKED_TASKS = tasks
+    try:
+        # reseed random in each worker, else all would draw the same values from the state inherited at fork
+        with multiprocessing.get_context("fork").Pool(nbr_workers, initializer=random.seed) as pool:
+            return pool.map(_run_forked_task, range(len(tasks)), chunksize=1)
+    finally:
+        _FORKED_TASKS = []
+
+
+def write_lines(fp, lines, buffer_size=1 << 20):
+    # write an iterable of lines to file object fp, by chunks of about buffer_size characters
+    chunk, chunk_size = [], 0
+    for line in lines:
+        chunk.append(line)
+        chunk_size += len(line)
+        if chunk_size >= buffer_size:
+            fp.write(''.join(chunk))
+            chunk, chunk_size = [], 0
+    if chunk:
+        fp.write(''.join(chunk))
+
+
+def write_db_inst(dbinst, asp=True, printed=False, target_dir=".", target_file="database", sqlite=False, csv=False,
+                  split_asp=False, nbr_shards=1, compression=None, workers=1):
+    # split_asp writes ASP facts in a directory, a file per relation (or nbr_shards ones) with a manifest, by workers
+    # processes. compression ("gzip", "bz2" or "xz") applies to ASP files.
     from pathlib import Path
+    from src.utils.dbexport import export_sqlite, export_csv, export_asp_shards, open_output
     Path(target_dir).mkdir(parents=True, exist_ok=True)
     filepath_asp = f"{target_dir}/ASP_{target_file}"
     filepath_print = f"{target_dir}/PRINT_{target_file}"
+    filepath_sqlite = f"{target_dir}/SQLITE_{target_file}.sqlite"
+    dirpath_csv = f"{target_dir}/CSV_{target_file}"
 
     def write_it(path, s):
         with open(path, 'w+') as fp:
             fp.write(s)
-    if asp:
-        write_it(filepath_asp, dbinst.repr_ASP())
+    if asp and (split_asp or nbr_shards > 1):
+        export_asp_shards(dbinst, filepath_asp, nbr_shards, compression, workers)
+    elif asp:
+        fp, _ = open_output(filepath_asp, compression)
+        with fp:
+            write_lines(fp, dbinst.iter_ASP())
     if printed:
         write_it(filepath_print, str(dbinst))
+    if sqlite:
+        export_sqlite(dbinst, filepath_sqlite)
+    if csv:
+        export_csv(dbinst, dirpath_csv)
+
+
+def stream_db_inst(rels_inst_params, target_dir=".", target_file="database", chunk_size=100000, **db_params):
+    # generate a database instance writing its tuples as ASP facts as they are generated (not kept in memory),
+    # in the file write_db_inst would write. Return the DBInstance (without tuples).
+    from pathlib import Path
+    from src.utils.dbexport import ASPSink
+    from src.instantiation.dbinstance import DBInstance
+    Path(target_dir).mkdir(parents=True, exist_ok=True)
+    with ASPSink(f"{target_dir}/ASP_{target_file}") as sink:
+        return DBInstance(rels_inst_params, sink=sink, chunk_size=chunk_size, **db_params)
+
+
+def read_db_inst(rels_inst_params, source, chunk_size=100000, **db_params):
+    # database instance of relations of rels_inst_params, with tuples read from ASP facts written by write_db_inst
+    # (source as the written file, or directory if split) instead of generated. Return the DBInstance.
+    from src.instantiation.dbinstance import DBInstance
+    dbinst = DBInstance(rels_inst_params, generate=False, **db_params)
+    dbinst.load_ASP(source, chunk_size)
+    return dbinst
 
 
 if __name__ == "__main__":
@@ -73,4 +213,5 @@ if __name__ == "__main__":
     print(get_indexes(["attr1", "attr0", "attrY"], ["attr0", "attr2", "attr1", "attrX"]))
     params = [5, 10, (1, {"attr": "val"}), 7, (9, {"attr2": "val2", "attr3": "val3"}), [88, (78, {})], {"aX": "valY"}]
     print(normalize_gen_param(params))
-    print(fill_tuple_dflt_vals((0, 1), (None, None, "toadd", "tadd2")))
\ No newline at end of file
+    print(fill_tuple_dflt_vals((0, 1), (None, None, "toadd", "tadd2")))
+    print(strongly_connected_components({'A': ['B'], 'B': ['C', 'D'], 'C': ['B'], 'D': ['D'], 'E': ['A']}))
\ No newline at end of file